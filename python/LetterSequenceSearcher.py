@@ -1,5 +1,7 @@
 import os
 
+from corpus import loadFile
+
 def getFiles(edition):
     fileDirectory = os.listdir('../texts')
     rightFiles = []
@@ -39,9 +41,13 @@ def getWordSequences(word):
 
     return dict
 
+def getStrippedLineWords(line):
+    return cleanLine(line.strip())
+
 def getLineSequences(line):
-    wordList = cleanLine(line)
+    return getWordListSequences(cleanLine(line))
 
+def getWordListSequences(wordList):
     sequenceToTokenDict = {}
     sequenceToWordDict = {}
 
@@ -66,14 +72,14 @@ def getLineSequences(line):
     
 
 def getFileSequences(fileName):
-    file = open('../texts/' + fileName, "r", encoding="utf-8")
+    textCorpus = loadFile(fileName, "LetterSequenceSearcher", getStrippedLineWords)
 
     sequenceDict = {}
 
-    for line in file.readlines():
-        line = line.strip()
+    for i in range(len(textCorpus)):
+        line = textCorpus.lines[i].strip()
         if line != "":
-            thisLineDict = getLineSequences(line)["counts"]
+            thisLineDict = getWordListSequences(textCorpus.tokens(i))["counts"]
             allSequences = list(thisLineDict.keys())
             for sequence in allSequences:
                 if sequence in sequenceDict:
@@ -81,8 +87,6 @@ def getFileSequences(fileName):
                 else:
                     sequenceDict[sequence] = thisLineDict[sequence]
 
-    file.close()
-
     return sequenceDict
 
 def getFullSequenceDict():
@@ -108,14 +112,14 @@ def getFullSequenceDict():
 
 
 def grabOneKJVVerses(fileName, englishString):
-    openedFile = open('../texts/' + fileName, 'r', encoding='utf-8')
+    textCorpus = loadFile(fileName, "LetterSequenceSearcherKJV", cleanLine)
     
     matchingLines = []
 
-    fileLines = openedFile.readlines()
-    for line in fileLines:
+    for i in range(len(textCorpus)):
+        line = textCorpus.lines[i]
         address = line.split(" ")[0]
-        words = cleanLine(line)
+        words = textCorpus.tokens(i)
         for word in words:
             if word == "":
                 continue
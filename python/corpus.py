@@ -0,0 +1,153 @@
+"""Tokenize each ../texts file once and keep the result on disk.
+
+The analysis scripts (kjvhapaxfinder, authorhapax, metricalHapax, massSearch,
+LetterSequenceSearcher, kjvConc) each have their own idea of how a line splits
+into words, so every script passes its own tokenizer and a variant name. A
+cache entry is keyed by the file's content hash, the variant name and a
+fingerprint of the tokenizer's code: edit the text file or the tokenizer and
+the entry is rebuilt on the next load. (If you change a helper the tokenizer
+calls, e.g. library.cleanWord, in a way that changes its output, rename the
+variant.)
+
+    from corpus import loadFile
+    book = loadFile("Genesis.KJV.txt", "kjvhapaxfinder", getKJVTokens)
+    for i in range(len(book)):
+        book.lines[i]      # the raw line, exactly as readlines() returned it
+        book.tokens(i)     # tokenizeLine(that line)
+
+Entries live in python/corpusCache/ (gitignored): a small header, the per-line
+token offsets and the token IDs as uint32 arrays, then the vocabulary and the
+raw lines. They are memory-mapped on load, so the arrays are never copied.
+"""
+import hashlib
+import io
+import mmap
+import os
+import struct
+from array import array
+
+from library import cleanWord
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, "corpusCache")
+
+MAGIC = b"EWC1"
+HEADER = struct.Struct("<4sIIIII")  # magic, lines, tokens, vocab size, vocab bytes, line bytes
+
+
+def getCleanWordTokens(line):
+    """The common case: library.cleanWord on every word after the address."""
+    return [cleanWord(word) for word in line.split(" ")[1:]]
+
+
+def getCodeFingerprint(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            getCodeFingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+
+
+def getTokenizerFingerprint(tokenizeLine):
+    digest = hashlib.sha1()
+    getCodeFingerprint(tokenizeLine.__code__, digest)
+    return digest.hexdigest()[:8]
+
+
+class CorpusFile:
+    def __init__(self, name, mapped):
+        self.name = name
+        self.mapped = mapped
+        magic, lineCount, tokenCount, vocabCount, vocabBytes, lineBytes = HEADER.unpack_from(mapped, 0)
+
+        view = memoryview(mapped)
+        offset = HEADER.size
+        self.lineStarts = view[offset:offset + 4 * (lineCount + 1)].cast("I")
+        offset += 4 * (lineCount + 1)
+        self.tokenIDs = view[offset:offset + 4 * tokenCount].cast("I")
+        offset += 4 * tokenCount
+
+        self.vocab = []
+        if vocabCount > 0:
+            self.vocab = str(mapped[offset:offset + vocabBytes], "utf-8").split("\0")
+        offset += vocabBytes
+
+        self.lines = []
+        if lineCount > 0:
+            self.lines = str(mapped[offset:offset + lineBytes], "utf-8").split("\0")
+
+    def __len__(self):
+        return len(self.lines)
+
+    def tokenIDsForLine(self, lineIndex):
+        return self.tokenIDs[self.lineStarts[lineIndex]:self.lineStarts[lineIndex + 1]]
+
+    def tokens(self, lineIndex):
+        vocab = self.vocab
+        return [vocab[tokenID] for tokenID in self.tokenIDsForLine(lineIndex)]
+
+
+def buildEntry(lines, tokenizeLine):
+    vocab = []
+    vocabIndex = {}
+    lineStarts = array("I", [0])
+    tokenIDs = array("I")
+    for line in lines:
+        for token in tokenizeLine(line):
+            tokenID = vocabIndex.get(token)
+            if tokenID is None:
+                tokenID = len(vocab)
+                vocabIndex[token] = tokenID
+                vocab.append(token)
+            tokenIDs.append(tokenID)
+        lineStarts.append(len(tokenIDs))
+
+    vocabBlob = "\0".join(vocab).encode("utf-8")
+    lineBlob = "\0".join(lines).encode("utf-8")
+    header = HEADER.pack(MAGIC, len(lines), len(tokenIDs), len(vocab), len(vocabBlob), len(lineBlob))
+    return header + lineStarts.tobytes() + tokenIDs.tobytes() + vocabBlob + lineBlob
+
+
+def loadFile(fileName, variant, tokenizeLine, directory="../texts"):
+    """Return the CorpusFile for directory/fileName, tokenized by tokenizeLine,
+    building (and caching) it first if the file or tokenizer has changed."""
+    with open(os.path.join(directory, fileName), "rb") as f:
+        data = f.read()
+    fileHash = hashlib.sha1(data).hexdigest()[:16]
+
+    variantDir = os.path.join(CACHE_DIR, variant)
+    prefix = fileName + "."
+    cacheName = f"{prefix}{fileHash}.{getTokenizerFingerprint(tokenizeLine)}.bin"
+    cachePath = os.path.join(variantDir, cacheName)
+
+    if not os.path.exists(cachePath):
+        # Same line splitting as open(..., encoding="utf-8").readlines()
+        lines = io.StringIO(data.decode("utf-8"), newline=None).readlines()
+        entry = buildEntry(lines, tokenizeLine)
+
+        os.makedirs(variantDir, exist_ok=True)
+        tempPath = cachePath + ".tmp"
+        with open(tempPath, "wb") as f:
+            f.write(entry)
+        os.replace(tempPath, cachePath)
+
+        # Drop entries for older versions of this file/tokenizer.
+        for oldName in os.listdir(variantDir):
+            if oldName != cacheName and oldName.startswith(prefix) and oldName[len(prefix):].count(".") == 2:
+                try:
+                    os.remove(os.path.join(variantDir, oldName))
+                except OSError:
+                    pass  # still mapped by another process (Windows); next time
+
+    with open(cachePath, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return CorpusFile(fileName, mapped)
+
+
+def loadFiles(fileNames, variant, tokenizeLine, directory="../texts"):
+    corpusFiles = {}
+    for fileName in fileNames:
+        corpusFiles[fileName] = loadFile(fileName, variant, tokenizeLine, directory)
+    return corpusFiles
@@ -0,0 +1,165 @@
+"""
+Deck health report: every consistency check diagnose_review.py (and the
+fix_* scripts) look for, counted per deck in one query per table.
+
+Each check is a count(*) FILTER (WHERE ...) over its table, so the whole
+report is three scans — cards, session_card_reviews, review_sessions — no
+matter how many checks or decks there are. Lookups into the other tables go
+through primary keys or a hashed NOT IN, not another scan per row.
+
+Run with:
+  py -3.12 python/deck_health.py              # every deck
+  py -3.12 python/deck_health.py Akkadian     # one deck
+  py -3.12 python/deck_health.py --timing     # also time each check on its own
+
+--timing re-runs every check as its own query, which gives the per-check
+timing breakdown (and shows what folding them into one scan saves).
+Read-only.
+"""
+
+import sys
+import os
+import time
+import psycopg2
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
+
+ARGS = [a for a in sys.argv[1:] if not a.startswith('--')]
+DECK = ARGS[0] if ARGS else None
+TIMING = '--timing' in sys.argv
+MAX_INTERVAL = 36500  # same threshold as fix_corrupt_intervals.py
+
+# (name, FILTER condition, is a problem when nonzero)
+CARD_CHECKS = [
+    ("cards", "true", False),
+    ("due_now", "c.time_due <= now() AND c.is_buried IS NOT TRUE AND c.is_suspended IS NOT TRUE", False),
+    ("due_today", "c.time_due <= now() + interval '1 day' AND c.is_buried IS NOT TRUE AND c.is_suspended IS NOT TRUE", False),
+    ("under_review", "c.under_review", False),
+    # under_review with no pending session_card_reviews row: nothing will ever clear it
+    ("stuck_under_review", """c.under_review AND c.card_id NOT IN (
+        SELECT card_id FROM session_card_reviews WHERE under_review AND card_id IS NOT NULL)""", True),
+    ("corrupt_interval", f"c.interval > {MAX_INTERVAL} OR c.interval < 0", True),
+    ("bad_stability", "c.last_reviewed IS NOT NULL AND (c.stability IS NULL OR c.stability = 'NaN' OR c.stability <= 0)", True),
+    ("dangling_peers", """EXISTS (SELECT 1 FROM unnest(c.peers) AS r(id)
+        WHERE NOT EXISTS (SELECT 1 FROM cards x WHERE x.card_id = r.id))""", True),
+    ("dangling_prereqs", """EXISTS (SELECT 1 FROM unnest(coalesce(c.prereqs, '{}') || coalesce(c.dependents, '{}')) AS r(id)
+        WHERE NOT EXISTS (SELECT 1 FROM cards x WHERE x.card_id = r.id))""", True),
+]
+
+SESSION_ROW_CHECKS = [
+    ("rows", "true", False),
+    ("pending", "s.under_review", False),
+    ("missing_session", "s.session_id IS NULL OR s.session_id NOT IN (SELECT session_id FROM review_sessions)", True),
+    ("missing_card", "s.card_id IS NULL OR s.card_id NOT IN (SELECT card_id FROM cards)", True),
+    # pending rows whose session was completed/abandoned: the submit that should have cleared them never will
+    ("pending_closed_session", """s.under_review AND s.session_id IN (
+        SELECT session_id FROM review_sessions WHERE session_status <> 'in_progress')""", True),
+    # diagnose_review check 6: invisible to the submit query, so its count check fails
+    ("pending_deck_mismatch", """s.under_review AND s.deck IS DISTINCT FROM (
+        SELECT x.deck FROM cards x WHERE x.card_id = s.card_id)""", True),
+    ("duplicate_rows", "s.copies > 1", True),
+]
+
+SESSION_CHECKS = [
+    ("sessions", "true", False),
+    ("in_progress", "r.session_status = 'in_progress'", False),
+    ("stale_in_progress", "r.session_status = 'in_progress' AND r.started_at < now() - interval '1 day'", True),
+    ("in_progress_no_rows", """r.session_status = 'in_progress' AND r.session_id NOT IN (
+        SELECT session_id FROM session_card_reviews WHERE under_review AND session_id IS NOT NULL)""", True),
+]
+
+# (table, row source, deck column, checks). {where} is the optional deck filter.
+SCANS = [
+    ("cards", "cards c {where}", "c.deck", CARD_CHECKS),
+    ("session_card_reviews",
+     "(SELECT *, count(*) OVER (PARTITION BY session_id, card_id) AS copies FROM session_card_reviews {where}) s",
+     "s.deck", SESSION_ROW_CHECKS),
+    ("review_sessions", "review_sessions r {where}", "r.deck", SESSION_CHECKS),
+]
+
+
+def scan_query(source, deck_column, checks):
+    where = "WHERE deck = %(deck)s" if DECK else ""
+    counts = ",\n       ".join(f"count(*) FILTER (WHERE {condition}) AS {name}" for name, condition, _ in checks)
+    return f"""
+        SELECT {deck_column} AS deck,
+               {counts}
+        FROM {source.format(where=where)}
+        GROUP BY {deck_column}
+        ORDER BY {deck_column}
+    """
+
+
+def run_scan(cur, source, deck_column, checks):
+    start = time.perf_counter()
+    cur.execute(scan_query(source, deck_column, checks), {'deck': DECK})
+    rows = cur.fetchall()
+    return rows, time.perf_counter() - start
+
+
+def print_table(title, columns, rows):
+    print(f"\n{'='*60}")
+    print(f"  {title}")
+    print('='*60)
+    if not rows:
+        print("  (no rows)")
+        return
+    col_widths = [max(len(str(c)), max(len(str(r[i])) for r in rows)) for i, c in enumerate(columns)]
+    header = "  " + "  ".join(str(c).ljust(col_widths[i]) for i, c in enumerate(columns))
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+    for row in rows:
+        print("  " + "  ".join(str(v).ljust(col_widths[i]) for i, v in enumerate(row)))
+
+
+def main():
+    print(f"\nDeck health for {repr(DECK) if DECK else 'all decks'}")
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.set_session(readonly=True)
+    cur = conn.cursor()
+
+    problems = []
+    scan_times = []
+    for table, source, deck_column, checks in SCANS:
+        rows, seconds = run_scan(cur, source, deck_column, checks)
+        scan_times.append((table, len(checks), seconds))
+
+        names = [name for name, _, _ in checks]
+        if len(rows) > 1:
+            rows.append(("(all)",) + tuple(sum(r[i] for r in rows) for i in range(1, len(names) + 1)))
+        print_table(f"{table} ({seconds * 1000:.1f} ms, one scan)", ["deck"] + names, rows)
+
+        for row in rows:
+            if row[0] == "(all)":
+                continue
+            for i, (name, _, is_problem) in enumerate(checks):
+                if is_problem and row[i + 1] > 0:
+                    problems.append((row[0], table, name, row[i + 1]))
+
+    print_table("Problems", ["deck", "table", "check", "count"], problems)
+    if not problems:
+        print("  All checks clean.")
+
+    timing_rows = [(table, checks, f"{seconds * 1000:.1f}") for table, checks, seconds in scan_times]
+    timing_rows.append(("(total)", sum(c for _, c, _ in scan_times), f"{sum(s for _, _, s in scan_times) * 1000:.1f}"))
+    print_table("Timing: one scan per table", ["table", "checks", "ms"], timing_rows)
+
+    if TIMING:
+        check_rows = []
+        total = 0
+        for table, source, deck_column, checks in SCANS:
+            for check in checks:
+                _, seconds = run_scan(cur, source, deck_column, [check])
+                total += seconds
+                check_rows.append((table, check[0], f"{seconds * 1000:.1f}"))
+        check_rows.append(("(total)", "", f"{total * 1000:.1f}"))
+        print_table("Timing: each check as its own query", ["table", "check", "ms"], check_rows)
+
+    conn.close()
+    print("\nDone.")
+
+
+if __name__ == '__main__':
+    main()
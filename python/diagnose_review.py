@@ -2,6 +2,9 @@
 Diagnose broken review submission for Synapdeck decks.
 Run with: py -3.12 diagnose_review.py [deck_name]
 Default deck: Akkadian
+
+For counts of every known inconsistency across all decks at once (one scan
+per table), run deck_health.py instead.
 """
 
 import sys
@@ -7,6 +7,11 @@ last_reviewed + interval days (falling back to now if last_reviewed is NULL).
 Run dry-run first (default), then pass --apply to commit.
   py -3.12 python/fix_corrupt_intervals.py
   py -3.12 python/fix_corrupt_intervals.py --apply
+  py -3.12 python/fix_corrupt_intervals.py --apply --batch-size 5000
+
+Corrupt rows are streamed through a server-side cursor --batch-size rows at a
+time (default 1000), and with --apply each batch is written with a single
+UPDATE ... FROM unnest(...), all in one transaction.
 """
 
 import sys
@@ -21,16 +26,72 @@ if not DATABASE_URL:
     raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
 
 APPLY = '--apply' in sys.argv
+BATCH_SIZE = int(sys.argv[sys.argv.index('--batch-size') + 1]) if '--batch-size' in sys.argv else 1000
 MAX_INTERVAL = 36500  # 100 years — anything over this is corrupt
 
 
+def plan_fix(row, now):
+    stability = row['stability']
+    last_reviewed = row['last_reviewed']
+
+    # Correct interval: use stability, capped to MAX_INTERVAL
+    if stability and not math.isnan(stability) and stability > 0:
+        correct_interval = min(MAX_INTERVAL, max(1, math.ceil(stability)))
+    else:
+        correct_interval = 1
+
+    # Correct time_due: last_reviewed + interval days (or now + interval if no last_reviewed)
+    base = last_reviewed if last_reviewed else now
+    if base.tzinfo is None:
+        base = base.replace(tzinfo=timezone.utc)
+    correct_due = base + timedelta(days=correct_interval)
+
+    return {
+        'card_id': row['card_id'],
+        'deck': row['deck'],
+        'old_interval': row['interval'],
+        'old_time_due': row['time_due_raw'],
+        'stability': stability,
+        'new_interval': correct_interval,
+        'new_time_due': correct_due,
+    }
+
+
+def apply_fixes(cur, fixes):
+    cur.execute("""
+        UPDATE cards AS c
+        SET interval = u.interval,
+            time_due = u.time_due
+        FROM unnest(%s::int[], %s::int8[], %s::timestamptz[]) AS u(card_id, interval, time_due)
+        WHERE c.card_id = u.card_id
+    """, ([fix['card_id'] for fix in fixes],
+          [fix['new_interval'] for fix in fixes],
+          [fix['new_time_due'] for fix in fixes]))
+
+
 def main():
     conn = psycopg2.connect(DATABASE_URL)
     conn.autocommit = False
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur = conn.cursor()
 
-    # Find all corrupt cards (use text cast to avoid Python overflow on the interval value)
-    cur.execute("""
+    cur.execute("SELECT count(*) FROM cards WHERE interval > %s", (MAX_INTERVAL,))
+    total = cur.fetchone()[0]
+
+    if total == 0:
+        print("No corrupt cards found (interval > 36500). Nothing to do.")
+        conn.close()
+        return
+
+    print(f"Found {total} corrupt card(s):\n")
+    if APPLY:
+        print(f"Applying {total} fix(es) in batches of {BATCH_SIZE}...\n")
+    now = datetime.now(timezone.utc)
+
+    # Stream the corrupt cards rather than fetchall() them (use text cast to
+    # avoid Python overflow on the interval value)
+    scan = conn.cursor(name='corrupt_cards', cursor_factory=psycopg2.extras.RealDictCursor)
+    scan.itersize = BATCH_SIZE
+    scan.execute("""
         SELECT card_id, deck, note_id, card_format,
                interval,
                stability,
@@ -40,66 +101,38 @@ def main():
         WHERE interval > %s
         ORDER BY deck, card_id
     """, (MAX_INTERVAL,))
-    corrupt = cur.fetchall()
 
-    if not corrupt:
-        print("No corrupt cards found (interval > 36500). Nothing to do.")
-        conn.close()
-        return
+    fixed = 0
+    while True:
+        rows = scan.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
 
-    print(f"Found {len(corrupt)} corrupt card(s):\n")
-    now = datetime.now(timezone.utc)
+        fixes = []
+        for row in rows:
+            fix = plan_fix(row, now)
+            fixes.append(fix)
 
-    fixes = []
-    for row in corrupt:
-        stability = row['stability']
-        last_reviewed = row['last_reviewed']
-
-        # Correct interval: use stability, capped to MAX_INTERVAL
-        if stability and not math.isnan(stability) and stability > 0:
-            correct_interval = min(MAX_INTERVAL, max(1, math.ceil(stability)))
-        else:
-            correct_interval = 1
-
-        # Correct time_due: last_reviewed + interval days (or now + interval if no last_reviewed)
-        base = last_reviewed if last_reviewed else now
-        if base.tzinfo is None:
-            base = base.replace(tzinfo=timezone.utc)
-        correct_due = base + timedelta(days=correct_interval)
-
-        fixes.append({
-            'card_id': row['card_id'],
-            'deck': row['deck'],
-            'old_interval': row['interval'],
-            'old_time_due': row['time_due_raw'],
-            'stability': stability,
-            'new_interval': correct_interval,
-            'new_time_due': correct_due,
-        })
-
-        print(f"  card {row['card_id']} ({row['deck']}, {row['card_format']})")
-        print(f"    interval:  {row['interval']} → {correct_interval} days")
-        print(f"    time_due:  {row['time_due_raw']} → {correct_due.date()}")
-        print(f"    stability: {stability}")
-        print()
+            print(f"  card {row['card_id']} ({row['deck']}, {row['card_format']})")
+            print(f"    interval:  {row['interval']} → {fix['new_interval']} days")
+            print(f"    time_due:  {row['time_due_raw']} → {fix['new_time_due'].date()}")
+            print(f"    stability: {fix['stability']}")
+            print()
+
+        if APPLY:
+            apply_fixes(cur, fixes)
+            fixed += len(fixes)
+            print(f"  ✅ Fixed {len(fixes)} card(s) ({fixed}/{total})\n")
+
+    scan.close()
 
     if not APPLY:
         print("DRY RUN — no changes made. Pass --apply to commit fixes.")
         conn.close()
         return
 
-    print(f"Applying {len(fixes)} fix(es)...")
-    for fix in fixes:
-        cur.execute("""
-            UPDATE cards
-            SET interval = %s,
-                time_due = %s
-            WHERE card_id = %s
-        """, (fix['new_interval'], fix['new_time_due'], fix['card_id']))
-        print(f"  ✅ Fixed card {fix['card_id']} ({fix['deck']})")
-
     conn.commit()
-    print(f"\nDone. {len(fixes)} card(s) corrected.")
+    print(f"Done. {fixed} card(s) corrected.")
     conn.close()
 
 
@@ -2,11 +2,11 @@
 Surgically re-sync a single verse across all_verses, verses_to_words and
 words_mass, using the (already-corrected) text file as the source of truth.
 
-Unlike processtexts / processtexts3 (which are built to *append* whole books
-and either clobber or double-count words_mass on an in-place edit), this diffs
-the verse's new word counts against what verses_to_words currently holds and
+Unlike processtexts (which is built to *append* whole books and either
+clobbers or double-counts words_mass on an in-place edit), this diffs the
+verse's new word counts against what verses_to_words currently holds and
 applies only the delta to words_mass. It is idempotent: run it twice and the
-second run is a no-op.
+second run is a no-op. processtexts3.main(book) does the same for a whole book.
 
 Usage (from anywhere):
     set -a; source python/vars.env; set +a      # load DATABASE_URL
@@ -0,0 +1,365 @@
+"""
+Fit the FSRS weights (W in simulate_submit.py / scheduler.ts) to a deck's
+actual review history.
+
+Each card's reviews are replayed through the same formulas the scheduler uses:
+the first review sets the initial stability/difficulty, and every later review
+is a prediction — retrievability R from the elapsed time and the current
+stability — scored against what happened (recalled = any rating above 1).
+The fit minimizes the mean log-loss of those predictions with Adam.
+
+The replay is vectorized twice over: across cards (one NumPy step per review
+index, so the Python loop is only as long as the longest card history) and
+across parameter sets (the current W plus a +/- nudge of each weight are
+replayed together, giving the whole central-difference gradient in one pass).
+A deck with tens of thousands of reviews fits in a few seconds.
+
+History comes from cards.past_reviews/past_grades (the Anki import) plus the
+finished session_card_reviews rows, or from a CSV export with the columns
+card_id, deck, reviewed_at, grade (grade = 1-4 or pass/hard/fail).
+
+Usage:
+    python python/fsrs_optimizer.py                       # every deck in the DB
+    python python/fsrs_optimizer.py Akkadian              # one deck
+    python python/fsrs_optimizer.py --csv reviews.csv [deck]
+    python python/fsrs_optimizer.py --dump-csv reviews.csv    # export the DB history, no fitting
+    python python/fsrs_optimizer.py --iterations 500 Akkadian
+
+Read-only: nothing is written back. Paste the printed W into scheduler.ts and
+simulate_submit.py if it beats the defaults.
+"""
+
+import sys
+import csv
+import math
+import time
+import numpy as np
+from datetime import datetime, timezone
+
+from simulate_submit import W, MAX_INTERVAL_DAYS, connect, grade_to_rating, to_epoch_seconds
+
+F, C = 19/81, -0.5
+
+# Only W[0]..W[16] enter the scheduler's formulas (17 and 18 are FSRS's
+# same-day terms, which scheduler.ts doesn't use), so only these are fitted.
+FITTED = 17
+
+# Bounds from the reference FSRS optimizer; keeps Adam out of regions where the
+# formulas stop making sense (negative stabilities, D weights that flip sign).
+W_BOUNDS = np.array([
+    (0.01, 100), (0.01, 100), (0.01, 100), (0.01, 100),   # initial stability per rating
+    (1, 10), (0.001, 4),                                  # initial difficulty
+    (0.001, 4), (0.001, 0.75),                            # difficulty update / mean reversion
+    (0, 4.5), (0, 0.8), (0.001, 3.5),                     # stability on success
+    (0.001, 5), (0.001, 0.25), (0.001, 0.9), (0, 4),      # stability on failure
+    (0, 1), (1, 6),                                       # hard penalty, easy bonus
+])
+
+EPSILON = 1e-4           # predictions are clipped to [EPSILON, 1 - EPSILON] for the log-loss
+PLATEAU = 20            # stop once this many iterations in a row fail to improve the best loss by TOLERANCE
+TOLERANCE = 1e-5
+MIN_PREDICTIONS = 50     # decks with fewer scored reviews are reported but not fitted
+CALIBRATION_BINS = 10
+
+CSV_FIELDS = ['card_id', 'deck', 'reviewed_at', 'grade']
+
+
+def get_flag_value(flag, default=None):
+    if flag in sys.argv:
+        return sys.argv[sys.argv.index(flag) + 1]
+    return default
+
+
+def get_positional_args():
+    args = []
+    skip = False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif arg in ('--csv', '--dump-csv', '--iterations'):
+            skip = True
+        elif not arg.startswith('--'):
+            args.append(arg)
+    return args
+
+
+def to_rating(grade):
+    """A past_grades / session_card_reviews / CSV grade -> rating 1-4, or None to skip."""
+    if grade is None:
+        return None
+    if isinstance(grade, str):
+        grade = grade.strip()
+        if grade == '':
+            return None
+        if not grade.isdigit():
+            return grade_to_rating(grade)
+    rating = int(grade)
+    return rating if 1 <= rating <= 4 else None
+
+
+def parse_timestamp(value):
+    if isinstance(value, datetime):
+        return to_epoch_seconds(value)
+    return to_epoch_seconds(datetime.fromisoformat(value))
+
+
+# ── Loading ────────────────────────────────────────────────────────────────
+
+def add_review(histories, deck, card_id, reviewed_at, grade):
+    rating = to_rating(grade)
+    if reviewed_at is None or rating is None:
+        return
+    histories.setdefault(deck, {}).setdefault(card_id, []).append((parse_timestamp(reviewed_at), rating))
+
+
+def load_history_from_db(deck=None):
+    """{deck: {card_id: [(epoch seconds, rating), ...]}} from the database."""
+    conn = connect()
+    cur = conn.cursor()
+    histories = {}
+
+    deck_filter = "AND deck = %s" if deck else ""
+    params = (deck,) if deck else ()
+
+    cur.execute(f"""
+        SELECT card_id, deck, past_reviews, past_grades
+        FROM cards
+        WHERE past_reviews IS NOT NULL {deck_filter}
+    """, params)
+    for card_id, card_deck, past_reviews, past_grades in cur:
+        for reviewed_at, grade in zip(past_reviews, past_grades or []):
+            add_review(histories, card_deck, card_id, reviewed_at, grade)
+
+    # grade is INT2 in SQL_commands.sql but the server writes pass/hard/fail into it
+    cur.execute(f"""
+        SELECT card_id, deck, reviewed_at, grade::text
+        FROM session_card_reviews
+        WHERE under_review = false AND reviewed_at IS NOT NULL {deck_filter}
+    """, params)
+    for card_id, card_deck, reviewed_at, grade in cur:
+        add_review(histories, card_deck, card_id, reviewed_at, grade)
+
+    conn.close()
+    return histories
+
+
+def load_history_from_csv(path, deck=None):
+    histories = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if deck and row['deck'] != deck:
+                continue
+            add_review(histories, row['deck'], row['card_id'], row['reviewed_at'], row['grade'])
+    return histories
+
+
+def dump_history_to_csv(histories, path):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        for deck in sorted(histories):
+            for card_id, reviews in histories[deck].items():
+                for seconds, rating in sorted(set(reviews)):
+                    writer.writerow([card_id, deck, datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None).isoformat(), rating])
+                    count += 1
+    print(f"Wrote {count} reviews to {path}")
+
+
+def histories_to_arrays(cards):
+    """{card_id: reviews} -> elapsed days since the previous review, ratings,
+    and history lengths, as (cards x longest history) arrays padded with 0.
+    Reviews are sorted and exact duplicates (the same review in both
+    past_reviews and session_card_reviews) dropped. Cards come longest history
+    first, so the cards still active at any review index are a prefix."""
+    sequences = [sorted(set(reviews)) for reviews in cards.values()]
+    sequences = sorted((s for s in sequences if len(s) > 0), key=len, reverse=True)
+    lengths = np.array([len(s) for s in sequences], dtype=int)
+    longest = lengths.max() if len(sequences) > 0 else 0
+
+    elapsed = np.zeros((len(sequences), longest))
+    ratings = np.zeros((len(sequences), longest), dtype=int)
+    for i, reviews in enumerate(sequences):
+        seconds = np.array([r[0] for r in reviews])
+        elapsed[i, 1:len(reviews)] = np.diff(seconds) / 86400
+        ratings[i, :len(reviews)] = [r[1] for r in reviews]
+    return elapsed, ratings, lengths
+
+
+# ── Replay ─────────────────────────────────────────────────────────────────
+
+def replay(weights, elapsed, ratings, lengths):
+    """Replay every card under every parameter set in weights (P x >=17),
+    yielding, for each review index after the first, the predicted R
+    (P x active cards) and whether each active card was recalled."""
+    w = [weights[:, j][:, None] for j in range(FITTED)]   # each (P, 1), broadcasts over cards
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        first = np.clip(ratings[:, 0], 1, 4)
+        S = weights[:, first - 1]
+        D = np.clip(w[4] - np.exp(w[5] * (first - 1)) + 1, 1, 10)
+        D_easy = np.clip(w[4] - np.exp(w[5] * 3) + 1, 1, 10)    # get_initial_difficulty(4)
+
+        for k in range(1, elapsed.shape[1]):
+            # lengths is sorted descending, so the active cards are a prefix
+            active = np.count_nonzero(lengths > k)
+            S, D = S[:, :active], D[:, :active]
+            rating = ratings[:active, k]
+
+            R = (1 + F * np.maximum(0, elapsed[:active, k]) / S) ** C
+            R = np.where(np.isnan(R), 0.01, np.maximum(0.01, R))
+            yield R, rating > 1
+
+            success = S * (1 + (11 - D) * S ** (-w[9]) * (np.exp(w[10] * (1 - R)) - 1)
+                           * np.where(rating == 2, w[15], 1) * np.where(rating == 4, w[16], 1) * np.exp(w[8]))
+            failure = np.minimum(S, D ** (-w[12]) * ((S + 1) ** w[13] - 1) * np.exp(w[14] * (1 - R)) * w[11])
+            S = np.where(rating > 1, success, failure)
+            S = np.minimum(np.where(np.isnan(S) | (S <= 0), w[2], S), MAX_INTERVAL_DAYS)
+
+            d_prime = D - w[6] * (rating - 3) * ((10 - D) / 9)
+            D = np.clip(w[7] * D_easy + (1 - w[7]) * d_prime, 1, 10)
+            D = np.where(np.isnan(D), 5, D)
+
+
+def log_losses(weights, elapsed, ratings, lengths):
+    """Mean log-loss of the predictions, one per parameter set."""
+    total = np.zeros(weights.shape[0])
+    count = 0
+    for R, recalled in replay(weights, elapsed, ratings, lengths):
+        p = np.clip(R, EPSILON, 1 - EPSILON)
+        total -= np.log(np.where(recalled, p, 1 - p)).sum(axis=1)
+        count += len(recalled)
+    return total / count
+
+
+def loss_and_gradient(w, elapsed, ratings, lengths):
+    """Loss at w and its central-difference gradient, from one batched replay
+    of 1 + 2 * FITTED parameter sets."""
+    h = 1e-4 * np.maximum(1, np.abs(w[:FITTED]))
+    nudges = np.zeros((2 * FITTED, len(w)))
+    nudges[np.arange(FITTED), np.arange(FITTED)] = h
+    nudges[FITTED + np.arange(FITTED), np.arange(FITTED)] = -h
+    losses = log_losses(np.vstack([w, w + nudges]), elapsed, ratings, lengths)
+    gradient = np.zeros(len(w))
+    gradient[:FITTED] = (losses[1:FITTED + 1] - losses[FITTED + 1:]) / (2 * h)
+    return losses[0], gradient
+
+
+def fit(elapsed, ratings, lengths, iterations=200, learning_rate=0.05):
+    """Adam from the default W, projected onto W_BOUNDS after every step.
+    Returns the best W seen, its loss and the number of iterations run."""
+    w = np.array(W, dtype=float)
+    lower, upper = W_BOUNDS[:, 0], W_BOUNDS[:, 1]
+    w[:FITTED] = np.clip(w[:FITTED], lower, upper)
+    # Steps are relative to each weight's range, which spans 0.25 to 100.
+    scale = np.ones(len(w))
+    scale[:FITTED] = upper - lower
+    m = np.zeros(len(w))
+    v = np.zeros(len(w))
+    beta1, beta2 = 0.9, 0.999
+
+    best_w, best_loss, best_iteration = w.copy(), math.inf, 0
+    for i in range(1, iterations + 1):
+        loss, gradient = loss_and_gradient(w, elapsed, ratings, lengths)
+        if loss < best_loss - TOLERANCE:
+            best_iteration = i
+        if loss < best_loss:
+            best_w, best_loss = w.copy(), loss
+        if i - best_iteration >= PLATEAU:
+            return best_w, best_loss, i
+        gradient = gradient * scale
+        m = beta1 * m + (1 - beta1) * gradient
+        v = beta2 * v + (1 - beta2) * gradient ** 2
+        step = learning_rate * (m / (1 - beta1 ** i)) / (np.sqrt(v / (1 - beta2 ** i)) + 1e-8)
+        # Cosine decay so the last steps settle instead of bouncing.
+        step *= 0.5 * (1 + math.cos(math.pi * (i - 1) / iterations))
+        w[:FITTED] = np.clip(w[:FITTED] - step[:FITTED] * scale[:FITTED] / 100, lower, upper)
+
+    loss = log_losses(w[None, :], elapsed, ratings, lengths)[0]
+    if loss < best_loss:
+        best_w, best_loss = w, loss
+    return best_w, best_loss, iterations
+
+
+# ── Reporting ──────────────────────────────────────────────────────────────
+
+def calibration(w, elapsed, ratings, lengths):
+    """Log-loss, RMSE over calibration bins (the FSRS benchmark's RMSE(bins))
+    and the bins themselves: (count, mean predicted R, observed recall rate)."""
+    steps = list(replay(np.asarray(w, dtype=float)[None, :], elapsed, ratings, lengths))
+    p = np.concatenate([R[0] for R, recalled in steps])
+    y = np.concatenate([recalled for R, recalled in steps]).astype(float)
+
+    clipped = np.clip(p, EPSILON, 1 - EPSILON)
+    log_loss = -np.mean(y * np.log(clipped) + (1 - y) * np.log(1 - clipped))
+
+    bin_index = np.minimum((p * CALIBRATION_BINS).astype(int), CALIBRATION_BINS - 1)
+    counts = np.bincount(bin_index, minlength=CALIBRATION_BINS)
+    predicted = np.bincount(bin_index, weights=p, minlength=CALIBRATION_BINS)
+    observed = np.bincount(bin_index, weights=y, minlength=CALIBRATION_BINS)
+    filled = counts > 0
+    predicted[filled] /= counts[filled]
+    observed[filled] /= counts[filled]
+    rmse = math.sqrt(np.sum(counts * (predicted - observed) ** 2) / counts.sum())
+
+    bins = [(counts[b], predicted[b], observed[b]) for b in range(CALIBRATION_BINS) if filled[b]]
+    return log_loss, rmse, bins
+
+
+def format_weights(w):
+    return "[" + ",".join(f"{x:.5g}" for x in w) + "]"
+
+
+def optimize_deck(deck, cards, iterations):
+    elapsed, ratings, lengths = histories_to_arrays(cards)
+    predictions = int(np.maximum(lengths - 1, 0).sum())
+    print(f"\n=== {deck}: {len(lengths)} cards, {int(lengths.sum())} reviews, {predictions} predictions ===")
+    if predictions < MIN_PREDICTIONS:
+        print(f"  Too little history to fit (need {MIN_PREDICTIONS} repeat reviews); keeping the defaults.")
+        return
+
+    default_loss, default_rmse, _ = calibration(W, elapsed, ratings, lengths)
+    start = time.perf_counter()
+    fitted, _, iterations_run = fit(elapsed, ratings, lengths, iterations)
+    elapsed_time = time.perf_counter() - start
+    fitted_loss, fitted_rmse, bins = calibration(fitted, elapsed, ratings, lengths)
+
+    print(f"  Fitted in {elapsed_time:.2f}s ({iterations_run} iterations)")
+    print(f"  {'':<10} {'log-loss':>9} {'RMSE(bins)':>11}")
+    print(f"  {'default':<10} {default_loss:>9.4f} {default_rmse:>11.4f}")
+    print(f"  {'fitted':<10} {fitted_loss:>9.4f} {fitted_rmse:>11.4f}")
+    print("  Calibration (fitted):")
+    print(f"    {'predicted R':<13} {'reviews':>8} {'mean R':>7} {'recalled':>9}")
+    for count, mean_predicted, recall_rate in bins:
+        low = math.floor(mean_predicted * CALIBRATION_BINS) / CALIBRATION_BINS
+        print(f"    {low:.1f}-{low + 1 / CALIBRATION_BINS:.1f}       {count:>8} {mean_predicted:>7.3f} {recall_rate:>9.3f}")
+    print(f"  W = {format_weights(fitted)}")
+
+
+def main():
+    positional = get_positional_args()
+    deck = positional[0] if positional else None
+    iterations = int(get_flag_value('--iterations', 200))
+    csv_path = get_flag_value('--csv')
+    dump_path = get_flag_value('--dump-csv')
+
+    if csv_path:
+        histories = load_history_from_csv(csv_path, deck)
+    else:
+        histories = load_history_from_db(deck)
+
+    if dump_path:
+        dump_history_to_csv(histories, dump_path)
+        return
+
+    if not histories:
+        print("No review history found" + (f" for deck {deck!r}." if deck else "."))
+        return
+
+    print(f"Default W = {format_weights(W)}")
+    for deck_name in sorted(histories):
+        optimize_deck(deck_name, histories[deck_name], iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+import contextlib
+import functools
+import io
+import multiprocessing
 import os
+from collections import deque, namedtuple
 import re
+import sys
+import time
 import xml.etree.ElementTree as ET
 from library import cantillationMarksCodePoints, leftoverHapaxes
 import unicodedata
@@ -24,27 +31,74 @@ def word_text(element):
     return "".join(parts)
 
 
+# The accents (U+0591-U+05AF) map to None; vowel points, dagesh etc. are kept.
+cantillationTable = str.maketrans({int(codePoint[1:], 16): None for codePoint in cantillationMarksCodePoints})
+
+# Memoized: the same forms recur constantly, and every <w>/<k>/<q> is stripped
+# twice (checkWordsAgainstHapaxes, then process_word_elements).
+@functools.lru_cache(maxsize=1 << 18)
 def killCantillationMarks(word):
     if not word:  # empty/None <w>/<k>/<q> text
         return ""
     word = unicodedata.normalize('NFD', word)  # Decompose
+    return unicodedata.normalize('NFC', word.translate(cantillationTable))  # Recompose
+
+
+def killCantillationMarksByEscape(word):
+    """The original per-character version; benchmarkCantillation checks
+    killCantillationMarks against it."""
+    if not word:
+        return ""
+    word = unicodedata.normalize('NFD', word)
     newWord = ""
     for char in word:
         unicodeChar = char.encode("unicode_escape").decode("utf-8")[1:]
         if unicodeChar not in cantillationMarksCodePoints:
             newWord += char
-    return unicodedata.normalize('NFC', newWord)  # Recompose
+    return unicodedata.normalize('NFC', newWord)
+
+
+def benchmarkCantillation(books=allOTBooks):
+    """Strip every <w>/<k>/<q> in each book's XML both ways (twice per word, as
+    generate_grebrew_file does), check the output is identical and time it."""
+    print(f"{'Book':<16}{'words':>8}{'old (s)':>10}{'new (s)':>10}{'speedup':>9}")
+    totalOld = 0
+    totalNew = 0
+    for book in books:
+        with open(f"../Hebrew XML/{book}.xml", 'r', encoding='utf-8') as f:
+            root = ET.fromstring(f.read())
+        words = [word_text(e) for e in root.iter() if e.tag in ('w', 'k', 'q')]
+
+        startTime = time.perf_counter()
+        oldWords = [killCantillationMarksByEscape(word) for word in words + words]
+        oldTime = time.perf_counter() - startTime
+
+        killCantillationMarks.cache_clear()
+        startTime = time.perf_counter()
+        newWords = [killCantillationMarks(word) for word in words + words]
+        newTime = time.perf_counter() - startTime
+
+        if [word.encode("utf-8") for word in oldWords] != [word.encode("utf-8") for word in newWords]:
+            raise ValueError(f"killCantillationMarks output differs in {book}")
+        totalOld += oldTime
+        totalNew += newTime
+        print(f"{book:<16}{len(words):>8}{oldTime:>10.3f}{newTime:>10.3f}{oldTime / newTime:>8.1f}x")
+    print(f"{'Total':<16}{'':>8}{totalOld:>10.3f}{totalNew:>10.3f}{totalOld / totalNew:>8.1f}x")
+
+
+@functools.lru_cache(maxsize=None)
+def readHapaxListLines():
+    with open("OTHapaxList.txt", "r", encoding="utf-8") as hapaxFile:
+        return tuple(hapaxFile.readlines())
 
 
 def grabHapaxes(book):
-    hapaxFile = open("OTHapaxList.txt", "r", encoding="utf-8")
     thisBookHapaxLine = ""
-    for line in hapaxFile.readlines():
+    for line in readHapaxListLines():
         if line.startswith(book):
             thisBookHapaxLine = line.split("|")[1].strip()
             break
 
-    hapaxFile.close()
     if not thisBookHapaxLine:  # no curated hapax list for this book -> no colouring
         return []
 
@@ -58,33 +112,118 @@ def grabHapaxes(book):
     return hapaxes
 
 
-def checkWordsAgainstHapaxes(xml_content, book_name):
-    root = ET.fromstring(xml_content)
-    book = root.find('.//book')
-    if book is None:
-        return f"Book {book_name} not found in XML"
-    
+class HapaxAutomaton:
+    """Aho-Corasick automaton over one book's hapaxes: findIn(word) gives every
+    hapax that occurs anywhere in word in a single left-to-right scan, instead
+    of an `in` test per hapax."""
+
+    def __init__(self, hapaxes):
+        self.goto = [{}]      # state -> {char: next state}; state 0 is the root
+        self.fail = [0]       # longest proper suffix of the state that is also a state
+        self.outputs = [[]]   # hapaxes ending at the state, including via fail links
+        self.matchesEverything = "" in hapaxes
+        for hapax in hapaxes:
+            if hapax == "":
+                continue
+            state = 0
+            for char in hapax:
+                nextState = self.goto[state].get(char)
+                if nextState is None:
+                    nextState = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][char] = nextState
+                state = nextState
+            if hapax not in self.outputs[state]:
+                self.outputs[state].append(hapax)
+
+        # Breadth first, so every fail target is finished before it's used.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nextState in self.goto[state].items():
+                queue.append(nextState)
+                failState = self.fail[state]
+                while failState != 0 and char not in self.goto[failState]:
+                    failState = self.fail[failState]
+                self.fail[nextState] = self.goto[failState].get(char, 0)
+                self.outputs[nextState] = self.outputs[nextState] + self.outputs[self.fail[nextState]]
+
+    def findIn(self, word):
+        found = set()
+        if self.matchesEverything:
+            found.add("")
+        goto = self.goto
+        fail = self.fail
+        state = 0
+        for char in word:
+            while state != 0 and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if self.outputs[state]:
+                found.update(self.outputs[state])
+        return found
+
+
+# One child of a <v>: its tag and, for <w>/<k>/<q>, the word with cantillation
+# stripped ("" for anything else). Verses are kept as lists of these instead of
+# as ElementTree elements, so a book never has to be held as a whole tree.
+VerseItem = namedtuple("VerseItem", ["tag", "text"])
+
+
+def verse_items(elements):
+    items = []
+    for element in elements:
+        if element.tag in ('w', 'k', 'q'):
+            items.append(VerseItem(element.tag, killCantillationMarks(word_text(element))))
+        else:
+            items.append(VerseItem(element.tag, ""))
+    return items
+
+
+def read_book_verses(xml_source):
+    """One streaming pass over the UXLC XML (a path or open file): the ordered
+    (chapter, verse, items) for every <v> of each <c> of the <book>, or None if
+    there is no <book>. Each <c> is cleared as soon as it has been read. (In
+    UXLC <c> only ever appears directly under <book>.)"""
+    verses = []
+    bookFound = False
+    for event, element in ET.iterparse(xml_source):
+        if element.tag == "c":
+            chapter_num = int(element.get('n'))
+            for verse in element.findall('v'):
+                verses.append((chapter_num, int(verse.get('n')), verse_items(verse)))
+            element.clear()
+        elif element.tag == "book":
+            bookFound = True
+            break
+
+    if not bookFound:
+        return None
+    return verses
+
+
+def checkWordsAgainstHapaxes(verses, book_name):
+    """Find the words containing each of the book's hapaxes, across the
+    (chapter, verse, items) list from read_book_verses."""
     allHapaxes = grabHapaxes(book_name)
     hapaxToMatchDict = {}
+    hapaxCopies = {}  # a hapax listed twice collects each match twice
     for hapax in allHapaxes:
         hapaxToMatchDict[hapax] = []
-
-    allWords = []
-    for chapter in book.findall('c'):
-        chapter_num = chapter.get('n')
-        for verse in chapter.findall('v'):
-            verse_num = verse.get('n')
-            words = []
-            i = 0
-            while i < len(verse):
-                element = verse[i]
-                if element.tag == 'k' or element.tag == 'q' or element.tag == 'w':
-                   cleanedWord = killCantillationMarks(word_text(element))
-                   for hapax in allHapaxes:
-                       if hapax in cleanedWord:
-                           hapaxToMatchDict[hapax].append(cleanedWord)
-                i += 1
-        #print(f"Processed chapter {str(chapter_num)}")
+        hapaxCopies[hapax] = hapaxCopies.get(hapax, 0) + 1
+
+    automaton = HapaxAutomaton(allHapaxes)
+    wordToHapaxes = {}  # the same forms recur, so scan each distinct one once
+    for chapter_num, verse_num, items in verses:
+        for item in items:
+            if item.tag == 'k' or item.tag == 'q' or item.tag == 'w':
+                cleanedWord = item.text
+                if cleanedWord not in wordToHapaxes:
+                    wordToHapaxes[cleanedWord] = automaton.findIn(cleanedWord)
+                for hapax in wordToHapaxes[cleanedWord]:
+                    hapaxToMatchDict[hapax].extend([cleanedWord] * hapaxCopies[hapax])
     
     unmatchedHapaxes = 0
     for hapax in allHapaxes:
@@ -140,36 +279,41 @@ def process_word_elements(elements, book_name, masterHapaxList, matchToHapaxDict
     cantillation stripped, qere/ketiv tagged, hapaxes coloured, whitespace
     normalized. Works on a whole verse's children or any slice of them (used by
     the Psalms superscription splitter)."""
+    return process_verse_items(verse_items(elements), book_name, masterHapaxList, matchToHapaxDict)
+
+
+def process_verse_items(items, book_name, masterHapaxList, matchToHapaxDict):
+    """process_word_elements for VerseItems (already cantillation-stripped)."""
     words = []
     i = 0
-    n = len(elements)
+    n = len(items)
     while i < n:
-        element = elements[i]
+        element = items[i]
         if element.tag == 'k':
             # A ketiv may be paired with one OR MORE qere words (e.g. Gen 30:11,
             # written בגד read as בָּא גָד). Consume all consecutive <k> then all
             # consecutive <q> so no qere word is dropped.
             ketivParts = []
-            while i < n and elements[i].tag == 'k':
-                ketivParts.append(word_text(elements[i]))
+            while i < n and items[i].tag == 'k':
+                ketivParts.append(items[i].text)
                 i += 1
             qereParts = []
-            while i < n and elements[i].tag == 'q':
-                qereParts.append(word_text(elements[i]))
+            while i < n and items[i].tag == 'q':
+                qereParts.append(items[i].text)
                 i += 1
-            ketiv = ' '.join(killCantillationMarks(p) for p in ketivParts)
-            qere = ' '.join(killCantillationMarks(p) for p in qereParts)
+            ketiv = ' '.join(ketivParts)
+            qere = ' '.join(qereParts)
             ketiv = colorHapaxes(ketiv, masterHapaxList, matchToHapaxDict, book_name)
             qere = colorHapaxes(qere, masterHapaxList, matchToHapaxDict, book_name)
             words.append(KQTagging(ketiv, qere))
         elif element.tag == 'q':
             # Lone qere (qere velo ketiv): read but never written -> show the qere.
-            loneQere = killCantillationMarks(word_text(element))
+            loneQere = element.text
             loneQere = colorHapaxes(loneQere, masterHapaxList, matchToHapaxDict, book_name)
             words.append(f'<span class="qereVeloKetiv">{loneQere}</span>')
             i += 1
         elif element.tag == 'w':
-            cleanedWord = killCantillationMarks(word_text(element))
+            cleanedWord = element.text
             if cleanedWord:
                 cleanedWord = colorHapaxes(cleanedWord, masterHapaxList, matchToHapaxDict, book_name)
                 words.append(cleanedWord)
@@ -187,24 +331,19 @@ def process_word_elements(elements, book_name, masterHapaxList, matchToHapaxDict
     return ' '.join(' '.join(words).split()).replace('־ ', '־')
 
 
-def process_xml_to_text(xml_content, book_name):
-    """Parse the UXLC XML into an ordered list of (chapter, verse, body) tuples
-    in the Masoretic (Hebrew) numbering, with cantillation stripped, qere/ketiv
-    tagged, and hapaxes coloured. Reversification to KJV numbering happens later
-    (generate_grebrew_file), not here."""
+def process_xml_to_text(xml_source, book_name):
+    """Parse the UXLC XML (a path or open file) into an ordered list of
+    (chapter, verse, body) tuples in the Masoretic (Hebrew) numbering, with
+    cantillation stripped, qere/ketiv tagged, and hapaxes coloured.
+    Reversification to KJV numbering happens later (generate_grebrew_file), not
+    here. The XML is read once (read_book_verses); hapax matching and the verse
+    bodies both work from that."""
     try:
-        hapaxes = grabHapaxes(book_name)
-
-        #print(hapaxes) # works...
-    
-        root = ET.fromstring(xml_content)
-        book = root.find('.//book')
-        if book is None:
+        verses = read_book_verses(xml_source)
+        if verses is None:
             return f"Book {book_name} not found in XML"
-        
-        output = []
 
-        hapaxMatchDict = checkWordsAgainstHapaxes(xml_content, book_name)
+        hapaxMatchDict = checkWordsAgainstHapaxes(verses, book_name)
 
         masterHapaxList = []
         matchToHapaxDict = {}
@@ -223,24 +362,18 @@ def process_xml_to_text(xml_content, book_name):
     
         splits = SPLIT_AT.get(book_name, {})
         collected = []  # list of (heb_chapter:int, heb_verse:int, body:str)
-        for chapter in book.findall('c'):
-            chapter_num = chapter.get('n')
-            #print(chapter_num)
-            for verse in chapter.findall('v'):
-                verse_num = verse.get('n')
-                els = list(verse)
-                key = (int(chapter_num), int(verse_num))
-                if key in splits:
-                    # One Hebrew verse the KJV divides in two: emit two bodies.
-                    left, right = split_elements(els, splits[key])
-                    collected.append((int(chapter_num), int(verse_num),
-                                      process_word_elements(left, book_name, masterHapaxList, matchToHapaxDict)))
-                    collected.append((int(chapter_num), int(verse_num),
-                                      process_word_elements(right, book_name, masterHapaxList, matchToHapaxDict)))
-                else:
-                    collected.append((int(chapter_num), int(verse_num),
-                                      process_word_elements(els, book_name, masterHapaxList, matchToHapaxDict)))
-            #print("Completed chapter " + str(chapter_num))
+        for chapter_num, verse_num, items in verses:
+            key = (chapter_num, verse_num)
+            if key in splits:
+                # One Hebrew verse the KJV divides in two: emit two bodies.
+                left, right = split_elements(items, splits[key])
+                collected.append((chapter_num, verse_num,
+                                  process_verse_items(left, book_name, masterHapaxList, matchToHapaxDict)))
+                collected.append((chapter_num, verse_num,
+                                  process_verse_items(right, book_name, masterHapaxList, matchToHapaxDict)))
+            else:
+                collected.append((chapter_num, verse_num,
+                                  process_verse_items(items, book_name, masterHapaxList, matchToHapaxDict)))
 
         return collected
     
@@ -421,9 +554,9 @@ SPLIT_AT = {
 
 
 def split_elements(els, word_index):
-    """Split a verse's child elements just before its `word_index`-th word
-    element (<w>/<k>/<q>), keeping any interspersed markers on the correct
-    side. Returns (left, right) element lists."""
+    """Split a verse's child elements (or VerseItems) just before its
+    `word_index`-th word element (<w>/<k>/<q>), keeping any interspersed
+    markers on the correct side. Returns (left, right) element lists."""
     count = 0
     for pos, e in enumerate(els):
         if e.tag in ("w", "k", "q"):
@@ -511,27 +644,106 @@ def reindex_by_kjv(verses, kjv_sizes):
     return out
 
 
-def generate_grebrew_file(book_name):
-    """Parse the UXLC XML for `book_name`, reversify to KJV numbering, and write
-    ../texts/{book_name}.Grebrew.txt (chapter.verse <hebrew html> per line)."""
-    if book_name in COMPLEX_BOOKS:
-        raise ValueError(f"{book_name} has a verse split/merge or superscription shift; handle separately")
-    with open(f"../Hebrew XML/{book_name}.xml", 'r', encoding='utf-8') as f:
-        xml_content = f.read()
-    verses = process_xml_to_text(xml_content, book_name)
+def build_grebrew_verses(book_name):
+    """The Hebrew verses of `book_name`, merged/inserted so they can be
+    reindexed by KJV chapter sizes, still in Masoretic numbering."""
+    verses = process_xml_to_text(f"../Hebrew XML/{book_name}.xml", book_name)
+    if isinstance(verses, str):  # "Book ... not found in XML"
+        raise ValueError(verses)
     verses = apply_merges(verses, book_name)   # no-op for non-merge books
     verses = apply_inserts(verses, book_name)  # no-op unless verses are supplied
-    verses = reindex_by_kjv(verses, kjv_chapter_sizes(book_name))
+    return verses
+
+
+def write_grebrew_file(book_name, verses):
+    """Write reindexed verses to ../texts/{book_name}.Grebrew.txt via a temp
+    file, so a crash never leaves a half-written book behind."""
     out_path = f"../texts/{book_name}.Grebrew.txt"
-    with open(out_path, 'w', encoding='utf-8') as f:
+    temp_path = out_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
         for ch, v, body in verses:
             f.write(f"{ch}.{v} {body}\n")
+    os.replace(temp_path, out_path)
     print(f"Wrote {out_path} ({len(verses)} verses)")
     return out_path
 
 
+def generate_grebrew_file(book_name):
+    """Parse the UXLC XML for `book_name`, reversify to KJV numbering, and write
+    ../texts/{book_name}.Grebrew.txt (chapter.verse <hebrew html> per line)."""
+    if book_name in COMPLEX_BOOKS:
+        raise ValueError(f"{book_name} has a verse split/merge or superscription shift; handle separately")
+    verses = build_grebrew_verses(book_name)
+    verses = reindex_by_kjv(verses, kjv_chapter_sizes(book_name))
+    return write_grebrew_file(book_name, verses)
+
+
+def generate_book_report(book_name):
+    """Pool worker for generate_all_grebrew_files: generate one book and
+    report on it, with anything it printed captured rather than interleaved."""
+    startTime = time.time()
+    report = {"book": book_name, "hebrew": "", "kjv": "", "status": "", "log": ""}
+    if book_name in COMPLEX_BOOKS:
+        report["status"] = "skipped (complex)"
+        report["seconds"] = 0
+        return report
+
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            verses = build_grebrew_verses(book_name)
+            kjv_sizes = kjv_chapter_sizes(book_name)
+            report["hebrew"] = len(verses)
+            report["kjv"] = sum(kjv_sizes)
+            if len(verses) != sum(kjv_sizes):
+                report["status"] = "MISMATCH, not written"
+            else:
+                write_grebrew_file(book_name, reindex_by_kjv(verses, kjv_sizes))
+                report["status"] = "written"
+    except Exception as e:
+        report["status"] = f"ERROR: {e}"
+
+    report["log"] = log.getvalue()
+    report["seconds"] = time.time() - startTime
+    return report
+
+
+def generate_all_grebrew_files(books=allOTBooks, jobs=None):
+    """Regenerate texts/{book}.Grebrew.txt for every book across `jobs`
+    processes (default: one per core), then print a per-book summary. Books in
+    COMPLEX_BOOKS are skipped (Psalms: process_psalms.py). A book whose verse
+    total doesn't match the KJV is reported and its file left untouched."""
+    startTime = time.time()
+    reports = []
+    with multiprocessing.Pool(jobs) as pool:
+        for report in pool.imap(generate_book_report, books):
+            # Each book's own messages (unmatched hapaxes etc.), in book order.
+            lines = [line for line in report["log"].splitlines() if not line.startswith("Wrote ")]
+            if lines:
+                print(f"--- {report['book']}")
+                print("\n".join(lines))
+            reports.append(report)
+
+    print(f"\n{'Book':<16}{'Hebrew':>8}{'KJV':>8}{'seconds':>9}  status")
+    for report in reports:
+        print(f"{report['book']:<16}{report['hebrew']:>8}{report['kjv']:>8}{report['seconds']:>9.2f}  {report['status']}")
+    written = len([report for report in reports if report["status"] == "written"])
+    print(f"\n{written}/{len(reports)} books written in {time.time() - startTime:.2f} seconds")
+    return reports
+
+
 if __name__ == "__main__":
     # Diagnostics over every OT book (read-only). Guarded so the module can be
     # imported without side effects.
-    for book in allOTBooks:
-        main(book)
\ No newline at end of file
+    #   python hebrewmanager.py --benchmark-cantillation
+    #   python hebrewmanager.py --generate-all [--jobs 8]   (writes texts/*.Grebrew.txt)
+    if "--benchmark-cantillation" in sys.argv:
+        benchmarkCantillation()
+    elif "--generate-all" in sys.argv:
+        jobs = None
+        if "--jobs" in sys.argv:
+            jobs = int(sys.argv[sys.argv.index("--jobs") + 1])
+        generate_all_grebrew_files(jobs=jobs)
+    else:
+        for book in allOTBooks:
+            main(book)
\ No newline at end of file
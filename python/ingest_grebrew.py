@@ -8,14 +8,23 @@ Safe by design: it only UPDATEs existing rows matched by verse_id (never INSERTs
 or DELETEs). Any verse_id with no matching row is reported, not created, so a
 versification error surfaces loudly instead of silently adding stray rows.
 
+Re-running is cheap: the local text of each verse is hashed and compared with
+md5(grebrew) server-side, and only verses whose stored text differs are sent
+and updated, each book in a single UPDATE ... FROM unnest(...).
+
 Usage (run from the python/ directory):
-    python3 ingest_grebrew.py Genesis --dry-run   # parse + report, no DB write
+    python3 ingest_grebrew.py Genesis --dry-run   # parse + report what would change, no DB write
     python3 ingest_grebrew.py Genesis             # write to grebrew
+    python3 ingest_grebrew.py                     # every NT book, in parallel
+    python3 ingest_grebrew.py --jobs 8            # ... over 8 pooled connections (default 4)
 """
+import hashlib
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import psycopg2
+import psycopg2.pool
 
 from library import bookToIDDict
 
@@ -52,40 +61,122 @@ def parse_grebrew_file(book_name):
     return rows
 
 
-def ingest(book_name, dry_run=False):
+def get_database_url():
     load_env()
     database_url = os.environ.get("DATABASE_URL")
     if not database_url:
         raise SystemExit("DATABASE_URL is not set (expected in python/vars.env).")
+    return database_url
 
-    rows = parse_grebrew_file(book_name)
-    print(f"{book_name}: parsed {len(rows)} verses from ../texts/{book_name}.Grebrew.txt")
-    if dry_run:
-        print("--dry-run: no database changes made.")
-        return
 
-    connection = psycopg2.connect(database_url)
+def ingest_rows(connection, rows, dry_run=False):
+    """Write rows [(verse_id, text)] into all_verses.grebrew over connection,
+    touching only existing rows whose text differs. Returns (matched,
+    updated, missing verse_ids)."""
+    verse_ids = [verse_id for verse_id, _ in rows]
+    texts = {verse_id: text for verse_id, text in rows}
+    digests = [hashlib.md5(text.encode("utf-8")).hexdigest() for _, text in rows]
+
     cursor = connection.cursor()
-    matched, missing = 0, []
-    for verse_id, text in rows:
+    # Only hashes go up here; the rows that come back are the missing verse_ids
+    # (never inserted, just reported) and the ones whose stored text differs.
+    cursor.execute(
+        """
+        SELECT i.verse_id, a.verse_id IS NOT NULL
+        FROM unnest(%s::bigint[], %s::text[]) AS i(verse_id, digest)
+        LEFT JOIN all_verses a ON a.verse_id = i.verse_id
+        WHERE a.verse_id IS NULL OR md5(a.grebrew) IS DISTINCT FROM i.digest
+        """,
+        (verse_ids, digests),
+    )
+    missing, changed = [], []
+    for verse_id, present in cursor.fetchall():
+        (changed if present else missing).append(verse_id)
+    changed = list(dict.fromkeys(changed))  # a verse listed twice in the file comes back twice
+    missing_set = set(missing)
+    missing = [verse_id for verse_id in verse_ids if verse_id in missing_set]  # file order
+
+    updated = len(changed)
+    if changed and not dry_run:
         cursor.execute(
-            "UPDATE all_verses SET grebrew = %s WHERE verse_id = %s",
-            (text, verse_id),
+            """
+            UPDATE all_verses AS a
+            SET grebrew = u.grebrew
+            FROM unnest(%s::bigint[], %s::text[]) AS u(verse_id, grebrew)
+            WHERE a.verse_id = u.verse_id AND a.grebrew IS DISTINCT FROM u.grebrew
+            """,
+            (changed, [texts[verse_id] for verse_id in changed]),
         )
-        if cursor.rowcount == 1:
-            matched += 1
-        else:
-            missing.append(verse_id)
-    connection.commit()
+        updated = cursor.rowcount
     cursor.close()
-    connection.close()
+    return len(rows) - len(missing), updated, missing
 
-    print(f"Updated grebrew on {matched} rows.")
+
+def report(book_name, parsed, matched, updated, missing, dry_run):
+    lines = [f"{book_name}: parsed {parsed} verses from ../texts/{book_name}.Grebrew.txt"]
+    if dry_run:
+        lines.append(f"--dry-run: {updated} of {matched} matching rows would change; no database changes made.")
+    else:
+        lines.append(f"Updated grebrew on {updated} rows ({matched - updated} of {matched} matched rows already up to date).")
     if missing:
-        print(f"WARNING: {len(missing)} verse_ids had no matching all_verses row:")
-        print("  " + ", ".join(str(v) for v in missing[:30]))
+        lines.append(f"WARNING: {len(missing)} verse_ids had no matching all_verses row:")
+        lines.append("  " + ", ".join(str(v) for v in missing[:30]))
     else:
-        print("All verses matched an existing row.")
+        lines.append("All verses matched an existing row.")
+    return "\n".join(lines)
+
+
+def ingest(book_name, dry_run=False):
+    database_url = get_database_url()
+    rows = parse_grebrew_file(book_name)
+
+    connection = psycopg2.connect(database_url)
+    matched, updated, missing = ingest_rows(connection, rows, dry_run)
+    connection.commit()
+    connection.close()
+    print(report(book_name, len(rows), matched, updated, missing, dry_run))
+
+
+def ingest_all(books, dry_run=False, jobs=4):
+    """ingest() every book, jobs at a time over a shared connection pool.
+    Each book is its own transaction; reports print in book order."""
+    database_url = get_database_url()
+    jobs = max(1, min(jobs, len(books)))
+    pool = psycopg2.pool.ThreadedConnectionPool(1, jobs, database_url)
+
+    def ingest_book(book_name):
+        rows = parse_grebrew_file(book_name)
+        connection = pool.getconn()
+        try:
+            matched, updated, missing = ingest_rows(connection, rows, dry_run)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            pool.putconn(connection)
+        return report(book_name, len(rows), matched, updated, missing, dry_run), updated, missing
+
+    total_updated, total_missing, failed = 0, 0, []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(ingest_book, book_name) for book_name in books]
+        for book_name, future in zip(books, futures):
+            try:
+                text, updated, missing = future.result()
+            except Exception as e:
+                failed.append(book_name)
+                print(f"{book_name}: FAILED ({type(e).__name__}: {e}); rolled back.")
+                continue
+            print(text)
+            total_updated += updated
+            total_missing += len(missing)
+    pool.closeall()
+
+    verb = "would change" if dry_run else "updated"
+    print(f"\n{len(books) - len(failed)} of {len(books)} books ingested: {total_updated} verses {verb}, "
+          f"{total_missing} verse_ids with no all_verses row.")
+    if failed:
+        print("Failed: " + ", ".join(failed))
 
 
 NTBooks = [
@@ -119,7 +210,10 @@ NTBooks = [
 ]
 
 if __name__ == "__main__":
-
-    for book in NTBooks:
-        ingest(book, dry_run="--dry-run" in sys.argv)
-        
+    args = [a for i, a in enumerate(sys.argv[1:], 1) if not a.startswith("--") and sys.argv[i - 1] != "--jobs"]
+    jobs = int(sys.argv[sys.argv.index("--jobs") + 1]) if "--jobs" in sys.argv else 4
+    if args:
+        for book in args:
+            ingest(book, dry_run="--dry-run" in sys.argv)
+    else:
+        ingest_all(NTBooks, dry_run="--dry-run" in sys.argv, jobs=jobs)
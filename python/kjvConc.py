@@ -1,5 +1,7 @@
 import os
 
+from corpus import loadFile
+
 def getAllFiles():
     files = []
     for file in os.listdir('../texts/'):
@@ -20,20 +22,21 @@ def cleanLine(line):
 
     return line.split(" ")
 
+def getStrippedWords(line):
+    return [word.strip() for word in cleanLine(line)]
+
 def processFile(fileAddress, wordToVerseDict):
     print(fileAddress)
     wordDict = {}
-    with open('../texts/' + fileAddress, 'r', encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines:
-            cleanedLine = cleanLine(line)
-            for word in cleanedLine:
-                word = word.strip()
-                if word in wordDict:
-                    wordDict[word] += 1
-                else:
-                    wordDict[word] = 1
-                    wordToVerseDict[word] = (fileAddress.replace(".KJV.txt", "") + " " + line)
+    textCorpus = loadFile(fileAddress, "kjvConc", getStrippedWords)
+    for i in range(len(textCorpus)):
+        line = textCorpus.lines[i]
+        for word in textCorpus.tokens(i):
+            if word in wordDict:
+                wordDict[word] += 1
+            else:
+                wordDict[word] = 1
+                wordToVerseDict[word] = (fileAddress.replace(".KJV.txt", "") + " " + line)
 
     return wordDict
 
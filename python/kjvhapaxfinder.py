@@ -1,6 +1,14 @@
+import functools
 import os
+import sys
+from array import array
 
 from library import bookToIDDict
+from corpus import loadFile
+from massIndex import getVerseID
+from substringIndex import loadSubstringIndex
+
+QUIET = "--quiet" in sys.argv  # skip the per-word lemma printout in getHapaxes
 
 def grabAllBooks():
     fileDirectory = os.listdir("../texts")
@@ -44,48 +52,128 @@ def getWordsFromLine(line):
             finalDict["words"].append(cleanWord(splitLine[i]))
     return finalDict
 
-def processBook(fileAddress):
-    thisBookDict = {}
-    file = open("../texts/" + fileAddress, "r", encoding="utf-8")
-    fileLines = file.readlines()
-    for line in fileLines:
-        line = line.strip()
-        if line != "":
-            thisLineDict = getWordsFromLine(line)
-            address = thisLineDict["address"]
-            words = thisLineDict["words"]
-            thisBookDict[address] = words
-    file.close()
-
-    return thisBookDict
+def getKJVTokens(line):
+    line = line.strip()
+    if line == "":
+        return []
+    return getWordsFromLine(line)["words"]
+
+class KJVCorpus:
+    """Every line of the KJV, read once, as parallel arrays indexed by verse
+    ordinal (file order, book by book): the book, the address, the text after
+    the address, and the getKJVTokens tokens as IDs into one sorted vocab.
+    getHapaxes, getAddressDict and wordSearch all work from the one copy
+    getKJVCorpus keeps in memory."""
+
+    def __init__(self, files):
+        self.bookNames = []
+        self.verseBooks = array("H")
+        self.addresses = []
+        self.texts = []
+        self.verseIDs = array("Q")
+        self.tokenStarts = array("I", [0])
+        self.tokenIDs = array("I")
+
+        wordToID = {}
+        vocab = []
+        for file in files:
+            bookName = file.replace(".KJV.txt", "")
+            bookNumber = len(self.bookNames)
+            self.bookNames.append(bookName)
+            bookCorpus = loadFile(file, "kjvhapaxfinder", getKJVTokens)
+
+            fileToCorpusID = array("I")
+            for word in bookCorpus.vocab:
+                if word not in wordToID:
+                    wordToID[word] = len(vocab)
+                    vocab.append(word)
+                fileToCorpusID.append(wordToID[word])
+
+            for i in range(len(bookCorpus)):
+                line = bookCorpus.lines[i].strip()
+                if line == "":
+                    continue
+                splitLine = line.split(" ")
+                self.verseBooks.append(bookNumber)
+                self.addresses.append(splitLine[0])
+                self.texts.append(" ".join(splitLine[1:]))
+                self.verseIDs.append(getVerseID(bookName, "KJV", splitLine[0]))
+                self.tokenIDs.extend(fileToCorpusID[tokenID] for tokenID in bookCorpus.tokenIDsForLine(i))
+                self.tokenStarts.append(len(self.tokenIDs))
+
+        # Sorted, so the vocab (and its substring index) doesn't depend on
+        # the order os.listdir returned the books in.
+        order = sorted(range(len(vocab)), key=vocab.__getitem__)
+        newIDs = array("I", bytes(4 * len(vocab)))
+        for newID in range(len(order)):
+            newIDs[order[newID]] = newID
+        self.vocab = [vocab[oldID] for oldID in order]
+        self.tokenIDs = array("I", (newIDs[tokenID] for tokenID in self.tokenIDs))
+
+        self.wordToID = {word: i for i, word in enumerate(self.vocab)}
+        self.search = None
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def tokens(self, ordinal):
+        vocab = self.vocab
+        return [vocab[tokenID] for tokenID in self.tokenIDs[self.tokenStarts[ordinal]:self.tokenStarts[ordinal + 1]]]
+
+    def line(self, ordinal):
+        """The verse's line as it appears in the file, minus surrounding whitespace."""
+        if self.texts[ordinal] == "":
+            return self.addresses[ordinal]
+        return self.addresses[ordinal] + " " + self.texts[ordinal]
+
+    def prepareSearch(self):
+        """What wordSearch looks words up in, built on the first search and
+        kept for the next ones: per word ID its number of occurrences and the
+        ordinals of its verses, the ordinals per verse ID, and the vocab's
+        substring index."""
+        wordCounts = array("I", bytes(4 * len(self.vocab)))
+        wordVerses = [array("I") for word in self.vocab]
+        verseIDOrdinals = {}
+        for ordinal in range(len(self)):
+            verseWordIDs = self.tokenIDs[self.tokenStarts[ordinal]:self.tokenStarts[ordinal + 1]]
+            for tokenID in verseWordIDs:
+                wordCounts[tokenID] += 1
+            for tokenID in set(verseWordIDs):
+                wordVerses[tokenID].append(ordinal)
+            verseIDOrdinals.setdefault(self.verseIDs[ordinal], []).append(ordinal)
+
+        self.search = {
+            "counts": wordCounts,
+            "verses": wordVerses,
+            "verseIDOrdinals": verseIDOrdinals,
+            "substringIndex": loadSubstringIndex(self.vocab, "exact", "kjvCorpus")
+        }
+        return self.search
+
+    def wordDicts(self):
+        """{book: {address: tokens}}, what processBook used to build per file."""
+        allBookDicts = {bookName: {} for bookName in self.bookNames}
+        for ordinal in range(len(self)):
+            allBookDicts[self.bookNames[self.verseBooks[ordinal]]][self.addresses[ordinal]] = self.tokens(ordinal)
+        return allBookDicts
+
+    def addressDict(self):
+        """{book: {address: verse text}}."""
+        output = {bookName: {} for bookName in self.bookNames}
+        for ordinal in range(len(self)):
+            output[self.bookNames[self.verseBooks[ordinal]]][self.addresses[ordinal]] = self.texts[ordinal].strip()
+        return output
+
+
+@functools.lru_cache(maxsize=None)
+def getKJVCorpus():
+    return KJVCorpus(grabAllBooks())
 
 def getAllWordDicts():
-    allBookDicts = {}
-    allBookFiles = grabAllBooks()
-    for book in allBookFiles:
-        bookName = book.replace(".KJV.txt", "")
-        allBookDicts[bookName] = processBook(book)
-
-    return allBookDicts
+    return getKJVCorpus().wordDicts()
 
 def getAddressDict():
-    output = {}
-    allBookFiles = grabAllBooks()
-    for bookFileName in allBookFiles:
-        bookName = bookFileName.replace(".KJV.txt", "")
-        output[bookName] = {}
-        file = open("../texts/" + bookFileName, "r", encoding="utf-8")
-        fileLines = file.readlines()
-        for line in fileLines:
-            if line.strip() != "":
-                splitLine = line.split(" ")
-                address = splitLine[0].strip()
-                text = " ".join(splitLine[1:]).strip()
-                output[bookName][address] = text
-        file.close()
-    return output
-
-        
+    return getKJVCorpus().addressDict()
 
 def getCountsAndAddresses(allBookDicts):
     wordToCountDict = {}
@@ -126,21 +214,7 @@ def getCountsAndAddresses(allBookDicts):
 
     return output
 
-def replaceEnding(word, countDict, wordSuffix, replacementSuffix):
-    if word.endswith(wordSuffix):
-        lemmaVersion = word[0:(len(word)-len(wordSuffix))] + replacementSuffix
-        if lemmaVersion in countDict:
-            print(f"{word} ({countDict[word]}) > {lemmaVersion} ({countDict[lemmaVersion]})")
-            return lemmaVersion
-        else:
-            return ""
-    else:
-        return ""
-
-
-
-def checkAllEndings(word, countDict):
-    suffixTupleList = [
+suffixRules = [
     ("ing", ""),
     ("es", ""),
     ("ed", ""),
@@ -160,59 +234,92 @@ def checkAllEndings(word, countDict):
     ("es", "e"),
     ("est", "e"),
     ("ed", "e")
-    ]
-
+]
+
+# suffix -> [(rule number, replacement)], so a word only looks up its own last
+# 1-4 letters instead of trying every rule. Duplicate rules (("ed", "e") is
+# listed twice) are kept: each one adds the lemma again, as it always has.
+suffixRuleTable = {}
+for ruleNumber in range(len(suffixRules)):
+    suffix, replacement = suffixRules[ruleNumber]
+    if suffix not in suffixRuleTable:
+        suffixRuleTable[suffix] = []
+    suffixRuleTable[suffix].append((ruleNumber, replacement))
+suffixLengths = sorted(set(len(suffix) for suffix in suffixRuleTable))
+
+
+def getLemmata(word, countDict):
+    """The words in countDict that word reduces to under suffixRules, in rule
+    order. A word that is all suffix (e.g. "ed") can reduce to "", which
+    checkAllEndings reports but doesn't count as a lemma."""
+    matches = []
+    for length in suffixLengths:
+        if length > len(word):
+            break
+        for ruleNumber, replacement in suffixRuleTable.get(word[-length:], []):
+            lemmaVersion = word[0:(len(word)-length)] + replacement
+            if lemmaVersion in countDict:
+                matches.append((ruleNumber, lemmaVersion))
+    matches.sort()
+    return [lemma for ruleNumber, lemma in matches]
+
+
+def checkAllEndings(word, countDict, quiet=False):
     outputDict = {
         "probableHapax": True,
         "possibleLemmata": []
     }
 
-    for tuple in suffixTupleList:
-        lemmaVersion = replaceEnding(word, countDict, tuple[0], tuple[1])
+    for lemmaVersion in getLemmata(word, countDict):
+        if not quiet:
+            print(f"{word} ({countDict[word]}) > {lemmaVersion} ({countDict[lemmaVersion]})")
         if lemmaVersion != "":
             outputDict["probableHapax"] = False
             outputDict["possibleLemmata"].append(lemmaVersion)
-    
+
     return outputDict
 
+
+def classifyHapaxes(wordList, countDict, quiet=False):
+    """One pass over wordList: every count-1 word, split into probable hapaxes
+    (no lemma under suffixRules) and possible ones, each with its lemmata."""
+    probableHapaxObjects = {}
+    possibleHapaxObjects = {}
+    for word in wordList:
+        if countDict[word] == 1:
+            wordObject = checkAllEndings(word, countDict, quiet)
+            if not quiet:
+                print(wordObject)
+            if wordObject["probableHapax"]:
+                probableHapaxObjects[word] = wordObject["possibleLemmata"]
+            else:
+                possibleHapaxObjects[word] = wordObject["possibleLemmata"]
+    return probableHapaxObjects, possibleHapaxObjects
+
 def wordSearch():
     wordToSearch = input("Search for a word in the KJV: ").strip()
     word = cleanWord(wordToSearch)
-    allBookFiles = grabAllBooks()
-    verseCount = 0
-    wordAddresses = []
-    addressToTextDict = {}
+    kjvCorpus = getKJVCorpus()
+    search = kjvCorpus.search or kjvCorpus.prepareSearch()
+    matchingWords = search["substringIndex"].find(word)
 
     allSuperstrings = {}
-
-    for bookAddress in allBookFiles:
-        bookName = bookAddress.replace(".KJV.txt", "")
-        file = open("../texts/" + bookAddress, "r", encoding="utf-8")
-        fileLines = file.readlines()
-        for line in fileLines:
-            line = line.strip()
-            if line != "":
-                thisLineDict = getWordsFromLine(line)
-                wordIsInThisVerse = False
-                for otherWord in thisLineDict["words"]:
-                    if word in otherWord:
-                        wordIsInThisVerse = True
-                        if otherWord not in allSuperstrings:
-                            allSuperstrings[otherWord] = 1
-                        else:
-                            allSuperstrings[otherWord] += 1
-
-                if wordIsInThisVerse:
-                    verseCount += 1
-                    fullAddress = bookName + " " + thisLineDict["address"]
-                    wordAddresses.append(fullAddress)
-                    addressToTextDict[fullAddress] = " ".join(line.split(" ")[1:])
+    hitVerseIDs = set()
+    for otherWord in matchingWords:
+        wordID = kjvCorpus.wordToID[otherWord]
+        allSuperstrings[otherWord] = search["counts"][wordID]
+        for ordinal in search["verses"][wordID]:
+            hitVerseIDs.add(kjvCorpus.verseIDs[ordinal])
 
     print("\n")
 
-    for address in wordAddresses:
-        print(address)
-        print(addressToTextDict[address])
+    # Lines sharing a verse ID print as one verse, as the old index did.
+    for verseID in sorted(hitVerseIDs):
+        ordinals = search["verseIDOrdinals"][verseID]
+        bookName = kjvCorpus.bookNames[kjvCorpus.verseBooks[ordinals[0]]]
+        line = " ".join(kjvCorpus.line(ordinal) for ordinal in ordinals)
+        print(bookName + " " + line.split(" ")[0])
+        print(" ".join(line.split(" ")[1:]))
 
     allMatches = list(allSuperstrings.keys())
     allMatches.sort()
@@ -302,7 +409,7 @@ def writeHapaxesToFile(probableList, possibleList, countDict, addressDict, possi
     file.writelines(allLines)
     file.close()
 
-def getHapaxes():
+def getHapaxes(quiet=QUIET):
     chooseBook = input("Particular book? (n) or type: ")
     allBookDicts = getAllWordDicts()
     countsAndAddressDict = getCountsAndAddresses(allBookDicts)
@@ -318,27 +425,11 @@ def getHapaxes():
     countDict = countsAndAddressDict["counts"]
     addressDict = countsAndAddressDict["addresses"]
 
-    probableHapaxes = []
-    possibleHapaxes = []
-
     masterWordList.sort()
 
-    probableHapaxObjects = {}
-    possibleHapaxObjects = {}
-    for word in masterWordList:
-        if countDict[word] == 1:
-            fullAddress = addressDict[word][0]
-            wordObject = checkAllEndings(word, countDict)
-            print(wordObject)
-            if wordObject["probableHapax"]:
-                probableHapaxes.append(word)
-                probableHapaxObjects[word] = wordObject["possibleLemmata"]
-            else:
-                possibleHapaxes.append(word)
-                possibleHapaxObjects[word] = wordObject["possibleLemmata"]
-
-    probableHapaxes.sort()
-    possibleHapaxes.sort()
+    probableHapaxObjects, possibleHapaxObjects = classifyHapaxes(masterWordList, countDict, quiet)
+    probableHapaxes = sorted(probableHapaxObjects)
+    possibleHapaxes = sorted(possibleHapaxObjects)
 
     
 
@@ -357,19 +448,22 @@ def getHapaxes():
 
     #print(str(len(masterWordList)) + " possible hapaxes")
 
-def main(exit = False):
-
+def main():
+    # Loops until exit, so the corpus (and, after the first search, its word
+    # lookups) stays loaded and each further search is just the lookup.
     doWhatString = "Run the hapax file (h) or search (s)? "
-    if exit:
+    while True:
+        try:
+            doWhat = input(doWhatString).lower().strip()
+        except EOFError:
+            break
+
+        if doWhat == "h":
+            getHapaxes()
+        elif doWhat == "s":
+            wordSearch()
+        elif doWhat == "e":
+            break
         doWhatString = "Run the hapax file (h), search (s) or exit (e)? "
 
-    doWhat = input("Run the hapax file (h) or search (s)? ").lower().strip()
-
-    if doWhat == "h":
-        getHapaxes()
-    elif doWhat == "s":
-        wordSearch()
-    else:
-        main(doWhat == "e")
-
-main()
\ No newline at end of file
+main()
@@ -1,5 +1,18 @@
 # /C:/Users/Campbell/Desktop/eliot-web/python/library.py
 
+import functools
+import os
+import re
+import sys
+
+# What `from library import *` hands out; the diacritic/punctuation tables and
+# the golden-check helpers below are internal.
+__all__ = [
+    "bookToIDDict", "getBookIDs", "editionToNumDict", "handleEngma",
+    "cleanDiacritics", "cleanWord",
+    "cantillationMarksCodePoints", "leftoverHapaxes", "reversificationDictionary"
+]
+
 # Basic dictionary to export
 bookToIDDict = {
     "Genesis": "001",
@@ -75,6 +88,18 @@ bookToIDDict = {
 def getBookIDs():
     return bookToIDDict
 
+# First digit of an edition-specific verse ID (verses_to_words, words_mass):
+# edition + bookToIDDict ID + chapter + verse, e.g. 2001001001 is Genesis 1:1
+# in the First Edition. "1" is the edition-less all_verses ID.
+editionToNumDict = {
+    "First Edition": "2",
+    "Second Edition": "3",
+    "KJV": "4",
+    "Mayhew": "5",
+    "Zeroth Edition": "7",
+    "Grebrew": "8"
+}
+
 
 def handleEngma(word):
     labials = ["p", "b", "m", "P", "B", "M"]
@@ -95,7 +120,135 @@ def handleEngma(word):
             pass
     return word
 
+# cleanDiacritics / cleanWord run on every token of every text, so the
+# replacement chains they used to do one str.replace at a time are compiled
+# once here into translate tables plus a single regex pass, and memoized.
+
+_diacriticDict = {
+    "á": "a",
+    "Á": "A",
+    "à": "a",
+    "À": "A",
+    "â": "a",
+    "Â": "A",
+    "ä": "a",
+    "Ä": "A",
+    "ã": "aŋ",
+    "Ã": "AŊ",
+    "ā": "aŋ",
+    "Ā": "AŊ",
+    "é": "e",
+    "É": "E",
+    "è": "e",
+    "È": "E",
+    "ê": "e",
+    "Ê": "E",
+    "ë": "e",
+    "Ë": "E",
+    "ẽ": "eŋ",
+    "Ẽ": "EŊ",
+    "ē": "eŋ",
+    "Ē": "EŊ",
+    "í": "i",
+    "Í": "I",
+    "ì": "i",
+    "Ì": "I",
+    "î": "i",
+    "Î": "I",
+    "ï": "i",
+    "Ï": "I",
+    "ĩ": "iŋ",
+    "Ĩ": "IŊ",
+    "ī": "iŋ",
+    "Ī": "IŊ",
+    "ó": "o",
+    "Ó": "O",
+    "ò": "o",
+    "Ò": "O",
+    "ô": "o",
+    "Ô": "O",
+    "ö": "o",
+    "Ö": "O",
+    "õ": "oŋ",
+    "Õ": "OŊ",
+    "ō": "oŋ",
+    "Ō": "OŊ",
+    "ú": "u",
+    "Ú": "U",
+    "ù": "u",
+    "Ù": "U",
+    "û": "u",
+    "Û": "U",
+    "ü": "u",
+    "Ü": "U",
+    "ũ": "uŋ",
+    "Ũ": "UŊ",
+    "ū": "uŋ",
+    "Ū": "UŊ",
+    "ñ": "nn",
+    "Ñ": "NN",
+    "n⁻": "nn",
+    "N⁻": "NN",
+    "m̃": "mm",
+    "M̃": "MM",
+    "m⁻": "mm",
+    "M⁻": "MM",
+}
+
+_singleCharDiacritics = {diacritic: _diacriticDict[diacritic] for diacritic in _diacriticDict if len(diacritic) == 1}
+_multiCharDiacritics = {diacritic: _diacriticDict[diacritic] for diacritic in _diacriticDict if len(diacritic) > 1}
+
+# "m̃⁻" used to become "mm⁻" and then "mmm"; keep that.
+_multiCharDiacritics["m̃⁻"] = "mmm"
+_multiCharDiacritics["M̃⁻"] = "MMM"
+
+_diacriticTable = str.maketrans(_singleCharDiacritics)
+
+# The multi-character sequences (longest first), then engma: ŋ before a labial
+# is m, before anything else n, and a word-final ŋ is left alone.
+_diacriticRegex = re.compile(
+    "|".join(re.escape(sequence) for sequence in sorted(_multiCharDiacritics, key=len, reverse=True))
+    + "|[ŋŊ](?=.)",
+    re.DOTALL
+)
+
+def _replaceDiacriticMatch(match):
+    sequence = match.group(0)
+    if sequence in _multiCharDiacritics:
+        return _multiCharDiacritics[sequence]
+    nextChar = match.string[match.end()]
+    if sequence == "ŋ":
+        return "m" if nextChar in "pbmPBM" else "n"
+    return "M" if nextChar in "pbmPBM" else "N"
+
+@functools.lru_cache(maxsize=1 << 18)
 def cleanDiacritics(word):
+    word = word.translate(_diacriticTable)
+    return _diacriticRegex.sub(_replaceDiacriticMatch, word)
+
+
+_subdotTable = str.maketrans({"ṣ": "s", "ṡ": "s"})
+_smallCapTable = str.maketrans({"ᴏ": "o", "ʀ": "r", "ᴅ": "d"})
+_punctuationTable = str.maketrans("", "", '.,;:!?()[]{}"\'“”‘’—–…•·«»„¶\n')
+
+@functools.lru_cache(maxsize=1 << 18)
+def cleanWord(word):
+    word = word.translate(_subdotTable)
+
+    if (word.startswith("OO") and word.upper() != word):
+        word = "8" + word[2:]
+
+    word = word.translate(_smallCapTable).lower()
+
+    # Dashes come off the ends before punctuation goes, so "word-." keeps its dash.
+    word = word.strip("-")
+
+    return word.translate(_punctuationTable).strip()
+
+
+def _cleanDiacriticsReference(word):
+    """The original replace-chain cleanDiacritics; _checkGolden holds the
+    table/regex version to it."""
     diacriticDict = {
         "á": "a",
         "Á": "A",
@@ -174,11 +327,11 @@ def cleanDiacritics(word):
 
     if ("ŋ" in word or "Ŋ" in word):
         word = handleEngma(word)
-    
-        
+
     return word
 
-def cleanWord(word):    
+def _cleanWordReference(word):
+    """The original replace-chain cleanWord, kept for _checkGolden."""
     smallCapDict = {
         "ᴏ": "o",
         "ʀ": "r",
@@ -211,6 +364,32 @@ def cleanWord(word):
     return word.strip()
 
 
+def _checkGolden(directories=("../texts", "../texts_in_progress")):
+    """Run every distinct token of every file under directories through
+    cleanWord/cleanDiacritics and their reference versions; report and
+    return the tokens whose output differs."""
+    tokens = set()
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            for fileName in files:
+                with open(os.path.join(root, fileName), "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        tokens.update(line.split(" "))
+                        tokens.update(line.split())
+
+    mismatches = []
+    for token in sorted(tokens):
+        if cleanWord(token) != _cleanWordReference(token):
+            mismatches.append(("cleanWord", token, _cleanWordReference(token), cleanWord(token)))
+        if cleanDiacritics(token) != _cleanDiacriticsReference(token):
+            mismatches.append(("cleanDiacritics", token, _cleanDiacriticsReference(token), cleanDiacritics(token)))
+
+    for function, token, expected, actual in mismatches[:20]:
+        print(f"{function}({token!r}): expected {expected!r}, got {actual!r}")
+    print(f"{len(tokens)} distinct tokens checked, {len(mismatches)} mismatch(es)")
+    return mismatches
+
+
 cantillationMarksCodePoints = [
     "u0591",
     "u0592",
@@ -280,4 +459,13 @@ leftoverHapaxes = {
 
 reversificationDictionary = {
     
-}
\ No newline at end of file
+}
+
+
+if __name__ == "__main__":
+    # Golden check of cleanWord/cleanDiacritics against the reference versions
+    # over every token in texts/ and texts_in_progress/; exits 1 on a mismatch.
+    #   python library.py --check-golden
+    if "--check-golden" in sys.argv:
+        if _checkGolden():
+            sys.exit(1)
@@ -0,0 +1,355 @@
+"""Positional inverted index over the Massachusett texts, for offline search.
+
+massSearch.grabMassVerses rescans every edition file on every query. This
+builds, once, a map from each word (in its library.cleanWord form, i.e. the
+same headwords as words_mass) to every place it occurs: a list of
+(verse, position) postings. Verses use the edition-specific IDs that
+verses_to_words uses (library.editionToNumDict), so a hit can be looked up in
+the database too; positions count the verse's words from 0.
+
+The index is written to python/massIndex.bin (gitignored):
+
+    b"EWI2", a uint32 header length, a JSON header (the size/mtime of every
+    source file, the sorted vocabulary, array lengths), then four arrays:
+    verseIDs (uint64, one per verse, sorted), postingStarts (uint32, one per
+    word + 1), verseDeltas (uint32, the gap from the previous posting's verse
+    ordinal, so a word's verse list is a running sum) and positions (uint16).
+
+It is rebuilt automatically whenever a text file (or the tokenizer) has
+changed since it was written. The same machinery can index other files with
+another tokenizer: pass loadIndex the files, a corpus.py variant name and
+tokenizer, and an index path of their own.
+
+Queries:
+
+    wuttin          exact word (cleanWord is applied to the query)
+    wuttin*         every word starting with wuttin
+    wame wuttin     phrase: the words adjacent and in that order
+
+Usage (run from python/):
+    python massIndex.py             # interactive search
+    python massIndex.py rebuild     # force a rebuild
+"""
+import bisect
+import itertools
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+from corpus import getTokenizerFingerprint, loadFile
+from library import bookToIDDict, cleanWord, editionToNumDict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEXT_DIR = os.path.join(HERE, "..", "texts")
+INDEX_PATH = os.path.join(HERE, "massIndex.bin")
+
+MAGIC = b"EWI2"
+HEADER_LENGTH = struct.Struct("<I")
+
+massEditions = ["First Edition", "Second Edition", "Mayhew", "Zeroth Edition"]
+idToBookDict = {bookID: book for book, bookID in bookToIDDict.items()}
+numToEditionDict = {num: edition for edition, num in editionToNumDict.items()}
+
+
+def getIndexTokens(line):
+    """Same words processtexts3 puts in verses_to_words, in verse order."""
+    words = line.strip().replace("|", "").split(" ")[1:]
+    tokens = []
+    for word in words:
+        word = cleanWord(word)
+        if word != "":
+            tokens.append(word)
+    return tokens
+
+
+def getMassFiles():
+    """Every Massachusett edition file that has a verse ID scheme (the Bible
+    books; Confession of Faith etc. have no bookToIDDict entry)."""
+    massFiles = []
+    for file in sorted(os.listdir(TEXT_DIR)):
+        splitFile = file.split(".")
+        if len(splitFile) != 3 or splitFile[2] != "txt":
+            continue
+        if splitFile[0] in bookToIDDict and splitFile[1] in massEditions:
+            massFiles.append(file)
+    return massFiles
+
+
+def getVerseID(book, edition, address):
+    """processtexts3's specificID: lines without a chapter.verse address
+    (e.g. "Epilogue") all map to chapter/verse 999."""
+    chapterVerse = "999999"
+    if "." in address:
+        splitAddress = address.split(".")
+        chapterVerse = splitAddress[0].zfill(3) + splitAddress[1].zfill(3)
+    return int(editionToNumDict[edition] + bookToIDDict[book] + chapterVerse)
+
+
+def getFileStates(files):
+    fileStates = {}
+    for file in files:
+        stat = os.stat(os.path.join(TEXT_DIR, file))
+        fileStates[file] = [stat.st_size, stat.st_mtime_ns]
+    return fileStates
+
+
+def getFileVerses(file, variant="massIndex", tokenizeLine=getIndexTokens):
+    """[(verseID, line text, tokens)] for each non-blank line of one file."""
+    book, edition = file.split(".")[0], file.split(".")[1]
+    textCorpus = loadFile(file, variant, tokenizeLine, TEXT_DIR)
+    verses = []
+    for i in range(len(textCorpus)):
+        line = textCorpus.lines[i].strip()
+        if line == "":
+            continue
+        address = line.split(" ")[0]
+        verses.append((getVerseID(book, edition, address), line, textCorpus.tokens(i)))
+    return verses
+
+
+def getPhraseWords(words):
+    """The query words a phrase search matches on: cleaned, with any that
+    clean to nothing (e.g. a lone ",") dropped."""
+    words = [cleanWord(word) for word in words]
+    return [word for word in words if word != ""]
+
+
+class MassIndex:
+    def __init__(self, variant, tokenizeLine, fileStates, vocab, verseIDs, postingStarts, verseDeltas, positions):
+        self.variant = variant
+        self.tokenizeLine = tokenizeLine
+        self.fileStates = fileStates
+        self.vocab = vocab
+        self.wordToIndex = {word: i for i, word in enumerate(vocab)}
+        self.verseIDs = verseIDs
+        self.postingStarts = postingStarts
+        self.verseDeltas = verseDeltas
+        self.positions = positions
+        self.verseTextCache = {}
+
+    def getPostings(self, word):
+        """[(verse ordinal, position)] for an already-cleaned word."""
+        wordIndex = self.wordToIndex.get(word)
+        if wordIndex is None:
+            return []
+        start = self.postingStarts[wordIndex]
+        end = self.postingStarts[wordIndex + 1]
+        ordinals = itertools.accumulate(self.verseDeltas[start:end])
+        return list(zip(ordinals, self.positions[start:end]))
+
+    def toVerseHits(self, postings):
+        verseIDs = self.verseIDs
+        return [(verseIDs[ordinal], position) for ordinal, position in postings]
+
+    def exact(self, word):
+        """[(verseID, position)] for every occurrence of word."""
+        return self.toVerseHits(self.getPostings(cleanWord(word)))
+
+    def prefixWords(self, prefix):
+        prefix = cleanWord(prefix)
+        words = []
+        i = bisect.bisect_left(self.vocab, prefix)
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            words.append(self.vocab[i])
+            i += 1
+        return words
+
+    def prefix(self, prefix):
+        """{word: [(verseID, position)]} for every word starting with prefix."""
+        hits = {}
+        for word in self.prefixWords(prefix):
+            hits[word] = self.toVerseHits(self.getPostings(word))
+        return hits
+
+    def phrase(self, words):
+        """[(verseID, position of the first word)] wherever the words occur
+        next to each other, in order."""
+        words = getPhraseWords(words)
+        if len(words) == 0:
+            return []
+
+        # Rarest word first keeps the candidate set small.
+        order = sorted(range(len(words)), key=lambda k: self.getPostingCount(words[k]))
+        starts = None
+        for k in order:
+            shifted = {(ordinal, position - k) for ordinal, position in self.getPostings(words[k])}
+            starts = shifted if starts is None else starts & shifted
+            if len(starts) == 0:
+                return []
+        return self.toVerseHits(sorted(starts))
+
+    def getPostingCount(self, word):
+        wordIndex = self.wordToIndex.get(word)
+        if wordIndex is None:
+            return 0
+        return self.postingStarts[wordIndex + 1] - self.postingStarts[wordIndex]
+
+    def getVerseText(self, verseID):
+        """Book, edition and the raw line(s) for an edition-specific verse ID."""
+        idString = str(verseID)
+        book = idToBookDict[idString[1:4]]
+        edition = numToEditionDict[idString[0]]
+        file = f"{book}.{edition}.txt"
+        if file not in self.verseTextCache:
+            lines = {}
+            for lineID, line, tokens in getFileVerses(file, self.variant, self.tokenizeLine):
+                lines[lineID] = lines.get(lineID, []) + [line]
+            self.verseTextCache[file] = lines
+        return book, edition, " ".join(self.verseTextCache[file][verseID])
+
+
+def buildIndex(files, variant="massIndex", tokenizeLine=getIndexTokens):
+    fileStates = getFileStates(files)
+
+    verseEntries = []
+    for file in files:
+        for verseID, line, tokens in getFileVerses(file, variant, tokenizeLine):
+            verseEntries.append((verseID, tokens))
+    verseEntries.sort(key=lambda entry: entry[0])  # stable: repeated addresses keep file order
+
+    verseIDs = array("Q")
+    postingLists = {}
+    nextPosition = 0
+    for verseID, tokens in verseEntries:
+        if len(verseIDs) == 0 or verseIDs[-1] != verseID:
+            verseIDs.append(verseID)
+            nextPosition = 0
+        # A repeated address continues the verse rather than restarting it.
+        ordinal = len(verseIDs) - 1
+        for token in tokens:
+            if token not in postingLists:
+                postingLists[token] = []
+            postingLists[token].append((ordinal, nextPosition))
+            nextPosition += 1
+
+    vocab = sorted(postingLists)
+    postingStarts = array("I", [0])
+    verseDeltas = array("I")
+    positions = array("H")
+    for word in vocab:
+        previousOrdinal = 0
+        for ordinal, position in postingLists[word]:
+            verseDeltas.append(ordinal - previousOrdinal)
+            positions.append(position)
+            previousOrdinal = ordinal
+        postingStarts.append(len(positions))
+
+    return MassIndex(variant, tokenizeLine, fileStates, vocab, verseIDs, postingStarts, verseDeltas, positions)
+
+
+def saveIndex(index, path=INDEX_PATH):
+    header = json.dumps({
+        "variant": index.variant,
+        "tokenizer": getTokenizerFingerprint(index.tokenizeLine),
+        "files": index.fileStates,
+        "vocab": index.vocab,
+        "verseCount": len(index.verseIDs),
+        "postingCount": len(index.positions)
+    }, ensure_ascii=False).encode("utf-8")
+
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(index.verseIDs.tobytes())
+        f.write(index.postingStarts.tobytes())
+        f.write(index.verseDeltas.tobytes())
+        f.write(index.positions.tobytes())
+    os.replace(tempPath, path)
+
+
+def readIndex(path, variant, tokenizeLine):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        return None
+    headerLength = HEADER_LENGTH.unpack_from(data, 4)[0]
+    offset = 4 + HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + headerLength].decode("utf-8"))
+    offset += headerLength
+    if header["variant"] != variant or header["tokenizer"] != getTokenizerFingerprint(tokenizeLine):
+        return None
+
+    arrays = []
+    for typecode, count in [("Q", header["verseCount"]),
+                            ("I", len(header["vocab"]) + 1),
+                            ("I", header["postingCount"]),
+                            ("H", header["postingCount"])]:
+        values = array(typecode)
+        values.frombytes(data[offset:offset + values.itemsize * count])
+        offset += values.itemsize * count
+        arrays.append(values)
+
+    return MassIndex(variant, tokenizeLine, header["files"], header["vocab"], *arrays)
+
+
+def loadIndex(forceRebuild=False, files=None, variant="massIndex", tokenizeLine=getIndexTokens, path=INDEX_PATH):
+    """The saved index, rebuilt first if it is missing or any text changed.
+    Defaults to the Massachusett editions (getMassFiles)."""
+    if files is None:
+        files = getMassFiles()
+
+    index = None
+    if not forceRebuild and os.path.exists(path):
+        index = readIndex(path, variant, tokenizeLine)
+        if index is not None and index.fileStates != getFileStates(files):
+            print("Texts have changed since the index was built.")
+            index = None
+
+    if index is None:
+        startTime = time.time()
+        index = buildIndex(files, variant, tokenizeLine)
+        saveIndex(index, path)
+        print(f"Indexed {len(index.vocab)} words over {len(index.verseIDs)} verses in {round(time.time() - startTime, 2)} seconds.")
+    return index
+
+
+def printHits(index, hits, highlightLength=1):
+    for verseID, position in hits:
+        book, edition, text = index.getVerseText(verseID)
+        words = text.split(" ")
+        wordNumber = str(position + 1)
+        if highlightLength > 1:
+            wordNumber += f"-{position + highlightLength}"
+        print(f"{book} [{edition}] {words[0]} (word {wordNumber}): {' '.join(words[1:])}")
+
+
+def main():
+    index = loadIndex("rebuild" in sys.argv)
+    if "rebuild" in sys.argv:
+        return
+
+    while True:
+        query = input("\nSearch (blank to quit): ").strip()
+        if query == "":
+            break
+
+        startTime = time.perf_counter()
+        if query.endswith("*"):
+            prefixHits = index.prefix(query[:-1])
+            lookupTime = time.perf_counter() - startTime
+            for word in prefixHits:
+                print(f"\n{word} ({len(prefixHits[word])})")
+                printHits(index, prefixHits[word])
+            hitCount = sum(len(wordHits) for wordHits in prefixHits.values())
+        elif " " in query:
+            words = query.split()
+            hits = index.phrase(words)
+            lookupTime = time.perf_counter() - startTime
+            printHits(index, hits, len(getPhraseWords(words)))
+            hitCount = len(hits)
+        else:
+            hits = index.exact(query)
+            lookupTime = time.perf_counter() - startTime
+            printHits(index, hits)
+            hitCount = len(hits)
+
+        print(f"\n{hitCount} hits; lookup took {round(lookupTime * 1000, 3)} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,18 @@
 import os
+import sys
+
+from corpus import loadFile
+from library import cleanWord
+from massIndex import getIndexTokens, getMassFiles, loadIndex
+from substringIndex import foldFunctions, loadSubstringIndex
+
+# python massSearch.py [--no-diacritics | --8oo]
+# --no-diacritics matches ignoring diacritics, --8oo also treats 8 and oo as the same.
+FOLD = "exact"
+if "--no-diacritics" in sys.argv:
+    FOLD = "noDiacritics"
+if "--8oo" in sys.argv:
+    FOLD = "8oo"
 
 def getFiles(edition):
     fileDirectory = os.listdir('../texts')
@@ -22,38 +36,59 @@ def cleanLine(line):
 
     return line.split(" ")
 
-def grabMassVerses(searchString):
-    fileDirectory = os.listdir('../texts')
-    rightFiles = []
-    for file in fileDirectory:
-        if not (file.endswith("KJV.txt") or file.endswith("Grebrew.txt")):
-            rightFiles.append(file)
-    
+def getVerseSortKey(verseID):
+    # Book, chapter and verse first, then edition, so a verse's editions sit together.
+    return (verseID % 10**9, verseID // 10**9)
+
+def grabMassVerses(searchString, fold="exact"):
+    index = loadIndex()
+    matchingWords = loadSubstringIndex(index.vocab, fold).find(cleanWord(searchString))
+
+    wordCounts = {}
+    verseIDs = set()
+    for word in matchingWords:
+        postings = index.getPostings(word)
+        wordCounts[word] = len(postings)
+        for ordinal, position in postings:
+            verseIDs.add(index.verseIDs[ordinal])
+
     matchingLines = []
-    for file in rightFiles:
-        openedFile = open("../texts/" + file, "r", encoding="utf-8")
-        fileLines = openedFile.readlines()
+    for verseID in sorted(verseIDs, key=getVerseSortKey):
+        book, edition, line = index.getVerseText(verseID)
+        matchingLines.append(book + " " + edition + ": " + line)
+
+    # Texts with no verse IDs (Confession of Faith etc.) aren't in massIndex;
+    # they're small enough to scan.
+    foldWord = foldFunctions[fold]
+    query = foldWord(cleanWord(searchString))
+    indexedFiles = set(getMassFiles())
+    for file in sorted(os.listdir('../texts')):
+        if file in indexedFiles or file.endswith("KJV.txt") or file.endswith("Grebrew.txt"):
+            continue
+        textCorpus = loadFile(file, "massIndex", getIndexTokens)
         book = file.split(".")[0]
         edition = file.split(".")[1]
-        for line in fileLines:
-            line = line.strip()
-            address = line.split(" ")[0]
-            words = line.split(" ")[1:]
+        for i in range(len(textCorpus)):
             lineAdded = False
-            for word in words:
-                if searchString in word:
-                    matchingLines.append(book + " " + edition + ": " + line)
+            for word in textCorpus.tokens(i):
+                if query in foldWord(word):
+                    wordCounts[word] = wordCounts.get(word, 0) + 1
                     lineAdded = True
-                if lineAdded:
-                    continue
-                    
-    return matchingLines
+            if lineAdded:
+                matchingLines.append(book + " " + edition + ": " + textCorpus.lines[i].strip())
+
+    return matchingLines, wordCounts
 
 def main():
     searchString = input("Search for a string in the Mass texts: ").strip().lower()
 
-    allMatchingLines = grabMassVerses(searchString)
+    allMatchingLines, wordCounts = grabMassVerses(searchString, FOLD)
     for line in allMatchingLines:
         print(line)
 
+    finalLine = "\nMatches:\n\t"
+    for word in sorted(wordCounts):
+        finalLine += word + " (" + str(wordCounts[word]) + "), "
+    print(finalLine[0:-2])
+
 main()
\ No newline at end of file
@@ -1,5 +1,10 @@
 import os
 
+import numpy as np
+
+from corpus import loadFile
+from vocabTable import loadVocabTable
+
 
 def getOneLineWords(line):
     line = " ".join(line.split(" ")[1:])
@@ -16,13 +21,8 @@ def getOneLineWords(line):
 
     wordList = line.split(" ")
 
-    finishedWordList = []
-    for word in wordList:
-        word = word.strip()
-        if word not in finishedWordList:
-            finishedWordList.append(word)
-
-    return finishedWordList
+    # dict.fromkeys drops repeats in one pass and keeps first-seen order.
+    return list(dict.fromkeys(word.strip() for word in wordList))
 
 def getMetricalWordsOneLine(line):
     line = line.strip().lower()
@@ -36,58 +36,40 @@ def getMetricalWordsOneLine(line):
 
     wordList = line.split(" ")
 
-    finishedWordList = []
-    for word in wordList:
-        word = word.strip()
-        if word not in finishedWordList and word != "":
-            finishedWordList.append(word)
-    
-    return finishedWordList
-
-def getWordsInOneFile(fileName, dictionary):
-    file = open('../texts/' + fileName, "r", encoding="utf-8")
-    fileLines = file.readlines()
+    finishedWords = dict.fromkeys(word.strip() for word in wordList)
+    finishedWords.pop("", None)
+    return list(finishedWords)
 
-    for line in fileLines:
-        if line.strip() != "":
-            allWords = getOneLineWords(line)
-            for word in allWords:
-                if word in dictionary:
-                    dictionary.pop(word)
+def getEditionFiles(edition):
+    """The edition's files in ../texts, in os.listdir order as always."""
+    return [file for file in os.listdir("../texts/") if file.endswith(edition)]
 
-    file.close()
 
-    return dictionary
+def getMetricalWords(edition):
+    """Every distinct word of the metrical Psalms' verse lines (those starting
+    with a space)."""
+    metricalCorpus = loadFile("Psalms (metrical)." + edition, "metricalPsalms", getMetricalWordsOneLine, "../texts_in_progress")
+    allWordsMetrical = set()
+    for i in range(len(metricalCorpus)):
+        if metricalCorpus.lines[i].startswith(" "):
+            allWordsMetrical.update(metricalCorpus.tokens(i))
+    return allWordsMetrical
 
-def getAllWords(edition, dictionary):
-    allFiles = os.listdir("../texts/")
-    correctFiles = []
-    for file in allFiles:
-        if file.endswith(edition):
-            correctFiles.append(file)
-
-    dictionaryCopy = dictionary
-    print(len(dictionaryCopy.keys()))
-    for rightFile in correctFiles:
-        dictionaryCopy = getWordsInOneFile(rightFile, dictionaryCopy)
-
-        allKeys = list(dictionaryCopy.keys())
-        print(str(len(allKeys)) + " hapaxes after processing " + rightFile.split(".")[0])
 
 def checkWordsInMetrical(edition):
-    metricalLines = open("../texts_in_progress/Psalms (metrical)." + edition, "r", encoding = "utf-8").readlines()
-
-    allWordsMetrical = {}
-    for line in metricalLines:
-        if line.startswith(" "):
-            words = getMetricalWordsOneLine(line)
-            for word in words:
-                if word not in allWordsMetrical:
-                    allWordsMetrical[word] = False
-    
-    getAllWords(edition, allWordsMetrical)
-            
-
+    """Print how many metrical words are still unattested after each prose
+    file of the edition. Every word is looked up once in the edition's
+    vocabTable (cached per file), which says which file first has it."""
+    allWordsMetrical = getMetricalWords(edition)
+    correctFiles = getEditionFiles(edition)
+    table = loadVocabTable(texts=[(file, None) for file in correctFiles], variant="metricalHapax", tokenizeLine=getOneLineWords)
+
+    wordIDs = np.array([wordID for wordID in map(table.wordID, allWordsMetrical) if wordID is not None], dtype=np.int64)
+    removedBy = np.cumsum(np.bincount(table.firstTexts(wordIDs), minlength=len(correctFiles)))
+
+    print(len(allWordsMetrical))
+    for i in range(len(correctFiles)):
+        print(str(len(allWordsMetrical) - removedBy[i]) + " hapaxes after processing " + correctFiles[i].split(".")[0])
 
 
 def main(prompt):
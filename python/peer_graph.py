@@ -0,0 +1,331 @@
+"""
+Check (and optionally repair) the card relation graph: peers, prereqs and
+dependents across every deck.
+
+Loads card_id, note_id, deck, peers, prereqs and dependents for all cards in
+one query and keeps each relation as CSR arrays over dense card indices
+(offsets into a flat target array, -1 for an id that isn't a card), so every
+check below is a vectorized pass over the edges instead of a re-query per card:
+
+  dangling     an id in peers/prereqs/dependents that isn't a card
+  self         a card listed in its own peers/prereqs/dependents
+  cross-note   a peer from a different note (peers are the note's other cards)
+  asymmetric   u lists v as a peer but v doesn't list u; or u lists v as a
+               prereq but v doesn't list u as a dependent (and vice versa)
+  cycles       prereq cycles (strongly connected components, Tarjan)
+
+--apply rewrites the three arrays of every affected card in a single
+UPDATE ... FROM unnest(...): dangling, self and cross-note entries are dropped
+and missing mirror entries added. Cycles are only reported; which link to cut
+is a judgement call.
+
+Run dry-run first (default), then pass --apply to commit.
+  py -3.12 python/peer_graph.py
+  py -3.12 python/peer_graph.py --apply
+  py -3.12 python/peer_graph.py --show 50     # list up to 50 examples per issue (default 10)
+"""
+
+import sys
+import os
+import time
+import itertools
+import numpy as np
+import psycopg2
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if not DATABASE_URL:
+    raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
+
+APPLY = '--apply' in sys.argv
+SHOW = int(sys.argv[sys.argv.index('--show') + 1]) if '--show' in sys.argv else 10
+
+RELATIONS = ('peers', 'prereqs', 'dependents')
+
+
+class Relation:
+    """One array column as CSR: card i's entries are ids[offsets[i]:offsets[i+1]],
+    and targets holds the dense index of each (-1 when the id isn't a card)."""
+    def __init__(self, card_ids, lists):
+        lengths = np.fromiter((len(l) if l else 0 for l in lists), dtype=np.int64, count=len(lists))
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.sources = np.repeat(np.arange(len(lists)), lengths)
+        # NULL elements become -1, which no card has, so they count as dangling
+        self.ids = np.fromiter((-1 if x is None else x for x in itertools.chain.from_iterable(l for l in lists if l)),
+                               dtype=np.int64, count=int(self.offsets[-1]))
+        positions = np.minimum(np.searchsorted(card_ids, self.ids), max(len(card_ids) - 1, 0))
+        found = (card_ids[positions] == self.ids) if len(card_ids) > 0 else np.zeros(len(self.ids), dtype=bool)
+        self.targets = np.where(found, positions, -1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def entries(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+
+class CardGraph:
+    def __init__(self, rows):
+        """rows: (card_id, note_id, deck, peers, prereqs, dependents), ordered by card_id."""
+        self.card_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.note_ids = np.array([-1 if r[1] is None else r[1] for r in rows], dtype=np.int64)
+        self.decks = [r[2] for r in rows]
+        self.relations = {name: Relation(self.card_ids, [r[3 + k] for r in rows])
+                          for k, name in enumerate(RELATIONS)}
+        self.null = {name: np.array([r[3 + k] is None for r in rows], dtype=bool)
+                     for k, name in enumerate(RELATIONS)}
+
+    def __len__(self):
+        return len(self.card_ids)
+
+
+# ── Checks ─────────────────────────────────────────────────────────────────
+# Each returns entry positions: indexes into the relation's flat ids/targets
+# arrays (the card holding the entry is rel.sources[position]).
+
+def find_dangling(rel):
+    return np.nonzero(rel.targets < 0)[0]
+
+def find_self(rel):
+    return np.nonzero(rel.targets == rel.sources)[0]
+
+def find_cross_note(graph):
+    rel = graph.relations['peers']
+    valid = rel.targets >= 0
+    notes = graph.note_ids
+    cross = np.zeros(len(rel), dtype=bool)
+    cross[valid] = notes[rel.sources[valid]] != notes[rel.targets[valid]]
+    return np.nonzero(cross)[0]
+
+def edge_keys(rel, n, exclude):
+    """Sorted u * n + v for every valid u -> v entry not in exclude."""
+    keep = rel.targets >= 0
+    keep[exclude] = False
+    return np.sort(rel.sources[keep] * n + rel.targets[keep]), keep
+
+def find_missing_mirror(rel, mirror, n, exclude, mirror_exclude):
+    """Entries u -> v of rel (outside exclude) where mirror has no v -> u."""
+    mirror_keys, _ = edge_keys(mirror, n, mirror_exclude)
+    keep = rel.targets >= 0
+    keep[exclude] = False
+    candidates = np.nonzero(keep)[0]
+    wanted = rel.targets[candidates] * n + rel.sources[candidates]
+    positions = np.minimum(np.searchsorted(mirror_keys, wanted), max(len(mirror_keys) - 1, 0))
+    present = (mirror_keys[positions] == wanted) if len(mirror_keys) > 0 else np.zeros(len(wanted), dtype=bool)
+    return candidates[~present]
+
+def find_prereq_cycles(graph, exclude):
+    """Strongly connected components of the prereq graph (u -> v when v is a
+    prereq of u, or u a dependent of v) that contain a cycle. Iterative Tarjan,
+    O(cards + edges)."""
+    n = len(graph)
+    prereqs, dependents = graph.relations['prereqs'], graph.relations['dependents']
+    keep_p = prereqs.targets >= 0
+    keep_p[exclude['prereqs']] = False
+    keep_d = dependents.targets >= 0
+    keep_d[exclude['dependents']] = False
+    src = np.concatenate((prereqs.sources[keep_p], dependents.targets[keep_d]))
+    dst = np.concatenate((prereqs.targets[keep_p], dependents.sources[keep_d]))
+    order = np.argsort(src, kind='stable')
+    dst = dst[order].tolist()
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n)))).tolist()
+
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+    for root in np.unique(src).tolist():
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                child = dst[edge]
+                if index[child] == -1:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, offsets[child]))
+                elif on_stack[child]:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1:
+                    components.append(sorted(component))
+    return components
+
+
+# ── Repair ─────────────────────────────────────────────────────────────────
+
+def to_array_literal(values):
+    return None if values is None else "{" + ",".join(str(v) for v in values) + "}"
+
+def plan_repairs(graph, drops, additions):
+    """New (peers, prereqs, dependents) for every card whose arrays change.
+    drops: {relation: entry positions to remove}; additions: {relation:
+    (source index, card_id) pairs to append}."""
+    changed = {}
+    for name in RELATIONS:
+        rel = graph.relations[name]
+        touched = set(rel.sources[drops[name]].tolist())
+        added = {}
+        for i, card_id in additions[name]:
+            added.setdefault(i, []).append(card_id)
+        touched.update(added)
+        dropped = np.zeros(len(rel), dtype=bool)
+        dropped[drops[name]] = True
+
+        for i in touched:
+            start, end = rel.offsets[i], rel.offsets[i + 1]
+            kept = rel.ids[start:end][~dropped[start:end]].tolist()
+            for card_id in sorted(set(added.get(i, []))):
+                if card_id not in kept:
+                    kept.append(card_id)
+            changed.setdefault(i, {})[name] = kept
+
+    repairs = []
+    for i in sorted(changed):
+        arrays = []
+        for name in RELATIONS:
+            if name in changed[i]:
+                arrays.append(changed[i][name])
+            elif graph.null[name][i]:
+                arrays.append(None)
+            else:
+                arrays.append(graph.relations[name].entries(i).tolist())
+        repairs.append((int(graph.card_ids[i]), *arrays))
+    return repairs
+
+def apply_repairs(cur, repairs):
+    cur.execute("""
+        UPDATE cards AS c
+        SET peers      = u.peers::int[],
+            prereqs    = u.prereqs::int[],
+            dependents = u.dependents::int[]
+        FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[]) AS u(card_id, peers, prereqs, dependents)
+        WHERE c.card_id = u.card_id
+    """, ([r[0] for r in repairs],
+          [to_array_literal(r[1]) for r in repairs],
+          [to_array_literal(r[2]) for r in repairs],
+          [to_array_literal(r[3]) for r in repairs]))
+    return cur.rowcount
+
+
+# ── Main ───────────────────────────────────────────────────────────────────
+
+def print_issue(graph, title, rel, positions, describe):
+    print(f"\n  {title}: {len(positions)}")
+    if len(positions) == 0:
+        return
+    per_deck = {}
+    for p in positions.tolist():
+        deck = graph.decks[rel.sources[p]]
+        per_deck[deck] = per_deck.get(deck, 0) + 1
+    print("    by deck: " + ", ".join(f"{deck} {count}" for deck, count in sorted(per_deck.items())))
+    for p in positions[:SHOW].tolist():
+        i = rel.sources[p]
+        print(f"    card {graph.card_ids[i]} ({graph.decks[i]}): {describe(p)}")
+    if len(positions) > SHOW:
+        print(f"    ... and {len(positions) - SHOW} more")
+
+def main():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = False
+    cur = conn.cursor()
+
+    start = time.perf_counter()
+    cur.execute("""
+        SELECT card_id, note_id, deck, peers, prereqs, dependents
+        FROM cards
+        ORDER BY card_id
+    """)
+    rows = cur.fetchall()
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph = CardGraph(rows)
+    del rows
+    build_time = time.perf_counter() - start
+    n = len(graph)
+    edges = {name: len(rel) for name, rel in graph.relations.items()}
+    print(f"Loaded {n} cards, " + ", ".join(f"{count} {name}" for name, count in edges.items())
+          + f" entries ({load_time:.2f}s query, {build_time:.2f}s build)")
+
+    start = time.perf_counter()
+    peers, prereqs, dependents = (graph.relations[name] for name in RELATIONS)
+    dangling = {name: find_dangling(rel) for name, rel in graph.relations.items()}
+    self_refs = {name: find_self(rel) for name, rel in graph.relations.items()}
+    cross_note = find_cross_note(graph)
+    # Entries that will be dropped don't count as one side of a mirror pair.
+    bad = {name: np.concatenate((dangling[name], self_refs[name])) for name in RELATIONS}
+    bad['peers'] = np.concatenate((bad['peers'], cross_note))
+    asymmetric_peers = find_missing_mirror(peers, peers, n, bad['peers'], bad['peers'])
+    prereqs_without_dependent = find_missing_mirror(prereqs, dependents, n, bad['prereqs'], bad['dependents'])
+    dependents_without_prereq = find_missing_mirror(dependents, prereqs, n, bad['dependents'], bad['prereqs'])
+    cycles = find_prereq_cycles(graph, bad)
+    check_time = time.perf_counter() - start
+    print(f"Checked in {check_time:.2f}s")
+
+    for name, rel in graph.relations.items():
+        print_issue(graph, f"Dangling ids in {name}", rel, dangling[name], lambda p, rel=rel: "NULL entry" if rel.ids[p] == -1 else f"{rel.ids[p]} is not a card")
+        print_issue(graph, f"Self-references in {name}", rel, self_refs[name], lambda p: "lists itself")
+    print_issue(graph, "Cross-note peers", peers, cross_note,
+                lambda p: f"peer {peers.ids[p]} is on note {graph.note_ids[peers.targets[p]]}, "
+                          f"not {graph.note_ids[peers.sources[p]]}")
+    print_issue(graph, "Asymmetric peers", peers, asymmetric_peers,
+                lambda p: f"lists {peers.ids[p]}, which doesn't list it back")
+    print_issue(graph, "Prereqs missing the matching dependent", prereqs, prereqs_without_dependent,
+                lambda p: f"prereq {prereqs.ids[p]} doesn't list it as a dependent")
+    print_issue(graph, "Dependents missing the matching prereq", dependents, dependents_without_prereq,
+                lambda p: f"dependent {dependents.ids[p]} doesn't list it as a prereq")
+
+    print(f"\n  Prereq cycles: {len(cycles)}")
+    for component in cycles[:SHOW]:
+        print(f"    {graph.decks[component[0]]}: cards " + ", ".join(str(graph.card_ids[i]) for i in component))
+    if len(cycles) > SHOW:
+        print(f"    ... and {len(cycles) - SHOW} more")
+
+    additions = {
+        'peers': [(peers.targets[p], int(graph.card_ids[peers.sources[p]])) for p in asymmetric_peers.tolist()],
+        'prereqs': [(dependents.targets[p], int(graph.card_ids[dependents.sources[p]])) for p in dependents_without_prereq.tolist()],
+        'dependents': [(prereqs.targets[p], int(graph.card_ids[prereqs.sources[p]])) for p in prereqs_without_dependent.tolist()],
+    }
+    repairs = plan_repairs(graph, bad, additions)
+    print(f"\n{len(repairs)} card(s) need their peers/prereqs/dependents rewritten.")
+    if cycles:
+        print(f"({len(cycles)} prereq cycle(s) are not repaired automatically.)")
+
+    if not APPLY or not repairs:
+        if not APPLY:
+            print("DRY RUN — no changes made. Pass --apply to commit fixes.")
+        conn.close()
+        return
+
+    start = time.perf_counter()
+    updated = apply_repairs(cur, repairs)
+    conn.commit()
+    print(f"Done. {updated} card(s) rewritten in one statement ({time.perf_counter() - start:.2f}s).")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,17 @@
 # Run with:
 # py -3.12 -m processtexts3.py
+# py -3.12 -m processtexts3.py --jobs 8   (parse/tokenize books in 8 processes)
+# py -3.12 -m processtexts3.py --copy     (bulk-load through COPY + staging tables)
+# py -3.12 -m processtexts3.py --benchmark   (execute_values vs COPY, on a scratch DB!)
 
 import os
+import io
+import contextlib
+import csv
+import json
+import hashlib
+import sys
+import multiprocessing
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import execute_values
@@ -14,6 +24,10 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 if not DATABASE_URL:
     raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
 
+# --copy: load all_verses, verses_to_words and words_mass with COPY into
+# staging tables plus one INSERT ... ON CONFLICT each, instead of execute_values.
+USE_COPY = "--copy" in sys.argv
+
 def clear_tables(connection, whichTable="6"):
     areYouSure = input("THIS WILL DELETE ALL YOUR DATA FROM ALL YOUR TABLES.\nIF YOU'RE SURE, TYPE 'YES' (ALL CAPS): ")
     if areYouSure != "YES":
@@ -39,6 +53,8 @@ def clear_tables(connection, whichTable="6"):
         try:
             cursor.execute(executeStatement)
             connection.commit()
+            if whichTable in ["1", "2", "3", "5"]:
+                saveManifest({})
             print("Tables cleared successfully")
         except Exception as e:
             connection.rollback()
@@ -56,6 +72,10 @@ def delete_by_book(table_name: str, book_value: str) -> None:
         # Execute delete query
         delete_query = f"DELETE FROM {table_name} WHERE book = %s"
         cur.execute(delete_query, (book_value,))
+        manifest = loadManifest()
+        if book_value in manifest:
+            del manifest[book_value]
+            saveManifest(manifest)
         
         print(f"Deleted rows where book = {book_value}")
 
@@ -69,6 +89,91 @@ def delete_by_book(table_name: str, book_value: str) -> None:
         if conn:
             conn.close()
 
+ALL_VERSES_COLUMNS = [
+    "verse_id", "book", "chapter", "verse", "first_edition",
+    "second_edition", "mayhew", "zeroth_edition", "kjv", "grebrew"
+]
+WORDS_MASS_COLUMNS = ["headword", "verses", "counts", "lemma", "no_diacritics", "editions", "total_count"]
+
+def formatCopyValue(value):
+    # Postgres array literal, every element quoted so words can't break it.
+    if isinstance(value, list):
+        elements = []
+        for element in value:
+            element = str(element).replace("\\", "\\\\").replace('"', '\\"')
+            elements.append('"' + element + '"')
+        return "{" + ",".join(elements) + "}"
+    return value
+
+def bulkMerge(cursor, table, columns, rows, conflictColumn, updateSet):
+    # COPY the rows into a session-local staging table, then upsert them into
+    # `table` with a single INSERT ... ON CONFLICT. Caller commits.
+    stagingTable = "staging_" + table
+    columnList = ", ".join(columns)
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stagingTable} (LIKE {table}) ON COMMIT DELETE ROWS")
+    cursor.execute(f"TRUNCATE {stagingTable}")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    for row in rows:
+        writer.writerow([formatCopyValue(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {stagingTable} ({columnList}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    cursor.execute(f"""
+        INSERT INTO {table} ({columnList})
+        SELECT {columnList} FROM {stagingTable}
+        ON CONFLICT ({conflictColumn})
+        DO UPDATE SET {updateSet}
+    """)
+
+# Per book: size, mtime and hash of each ../texts file it was built from, and a
+# hash of every all_verses row, as of the last successful ingest. Lets main()
+# skip unchanged books and only diff the verses that moved in changed ones.
+MANIFEST_PATH = "textManifest.json"
+
+def loadManifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def saveManifest(manifest):
+    tempPath = MANIFEST_PATH + ".tmp"
+    with open(tempPath, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tempPath, MANIFEST_PATH)
+
+def getFileStates(book, oldEntry=None):
+    oldFiles = {}
+    if oldEntry is not None:
+        oldFiles = oldEntry["files"]
+    states = {}
+    for file in getBookFiles(book):
+        stat = os.stat(f"../texts/{file}")
+        oldState = oldFiles.get(file)
+        if oldState is not None and oldState["size"] == stat.st_size and oldState["mtime"] == stat.st_mtime:
+            contentHash = oldState["hash"]
+        else:
+            with open(f"../texts/{file}", "rb") as f:
+                contentHash = hashlib.sha1(f.read()).hexdigest()
+        states[file] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": contentHash}
+    return states
+
+def sameFileHashes(newStates, oldStates):
+    if newStates.keys() != oldStates.keys():
+        return False
+    for file in newStates:
+        if newStates[file]["hash"] != oldStates[file]["hash"]:
+            return False
+    return True
+
+def getVerseHashes(newDataDict):
+    verseHashes = {}
+    for id in newDataDict:
+        verseHashes[id] = hashlib.blake2b(repr(newDataDict[id]).encode("utf-8"), digest_size=8).hexdigest()
+    return verseHashes
+
 def alphabetizeMass(words: list[str]) -> list[str]:
     def getOrdering(word: str) -> tuple:
         return tuple(999 if c == '8' else ord(c) for c in word)
@@ -216,9 +321,7 @@ def updateMassWord(connection, headwords, newHeadwordRawObject):
         connection.rollback()
         print(f"Error updating words: {e}")
 
-def addRawText(connection, bookObject, updateKJV=False):
-    cursor = connection.cursor()
-
+def getVerseTuples(bookObject):
     allEditions = [
         "First Edition",
         "Second Edition",
@@ -228,25 +331,10 @@ def addRawText(connection, bookObject, updateKJV=False):
         "Grebrew"
     ]
 
-    editionsPresent = []
-    for edition in bookObject["editions"]:
-        if edition in allEditions:
-            editionsPresent.append(edition)
-
     genericIDList = bookObject["IDs"]
     rawTextDict = bookObject["dict"]
     book = bookObject["book"]
 
-    oldDataList = []
-    oldDataDict = {}
-
-    cursor.execute("SELECT * FROM all_verses WHERE book = %s", (book,))
-    rows = cursor.fetchall()
-    for existingTuple in rows:
-        stringID = str(existingTuple[0])
-        oldDataList.append(stringID)
-        oldDataDict[stringID] = existingTuple
-
     newDataList = []
     newDataDict = {}
     lastChapter = 0
@@ -277,11 +365,51 @@ def addRawText(connection, bookObject, updateKJV=False):
         )
         newDataList.append(genericID)
         newDataDict[genericID] = tuple
-    
+
+    return newDataList, newDataDict
+
+def addRawText(connection, bookObject, updateKJV=False, verseIDs=None):
+    cursor = connection.cursor()
+
+    allEditions = [
+        "First Edition",
+        "Second Edition",
+        "Mayhew",
+        "Zeroth Edition",
+        "KJV",
+        "Grebrew"
+    ]
+
+    editionsPresent = []
+    for edition in bookObject["editions"]:
+        if edition in allEditions:
+            editionsPresent.append(edition)
+
+    book = bookObject["book"]
+
+    oldDataList = []
+    oldDataDict = {}
+
+    if verseIDs is None:
+        cursor.execute("SELECT * FROM all_verses WHERE book = %s", (book,))
+    else:
+        # The manifest already told us which verses moved; only look at those.
+        cursor.execute("SELECT * FROM all_verses WHERE verse_id = ANY(%s)", ([int(id) for id in verseIDs],))
+    rows = cursor.fetchall()
+    for existingTuple in rows:
+        stringID = str(existingTuple[0])
+        oldDataList.append(stringID)
+        oldDataDict[stringID] = existingTuple
+
+    newDataList, newDataDict = getVerseTuples(bookObject)
+    if verseIDs is not None:
+        newDataList = [id for id in newDataList if id in verseIDs]
+        newDataDict = {id: newDataDict[id] for id in newDataList}
 
     idsToAdd = []
     idsToChange = []
 
+    failed = False
     changeAnything = False
     changeMass = False
     for id in newDataList:
@@ -290,17 +418,30 @@ def addRawText(connection, bookObject, updateKJV=False):
             newTuple = newDataDict[id]
             for i in range(len(newTuple)):
                 if newTuple[i] != oldTuple[i]:
-                    idsToAdd.append(id)
+                    idsToChange.append(id)
                     if (i > 3 and i < 8):
                         changeMass = True
                     break
         elif id in newDataDict:
             idsToAdd.append(id)
 
-    if len(idsToAdd) > 0:
-        changeAnything = True
+    # Verses in the database (for this book, or among verseIDs) that no text
+    # file has any more.
+    idsToRemove = []
+    for id in oldDataList:
+        if id not in newDataDict:
+            idsToRemove.append(id)
+
+    # Under --copy, changed verses ride along in the same upsert as new ones
+    # (its ON CONFLICT ... DO UPDATE rewrites them), so there is no UPDATE loop.
+    idsToMerge = idsToAdd
+    if USE_COPY:
+        idsToMerge = idsToAdd + idsToChange
+
+    if len(idsToMerge) > 0:
+        changeAnything = len(idsToAdd) > 0
         data = []
-        for id in idsToAdd:
+        for id in idsToMerge:
             data.append(newDataDict[id])
         try:
             original_start_time = time.time()
@@ -311,22 +452,39 @@ def addRawText(connection, bookObject, updateKJV=False):
                 second_edition, mayhew, zeroth_edition, kjv, grebrew
             ) VALUES %s
             """
-            execute_values(
-            cursor, 
-            insert_query, 
-            data,
-            page_size=50  # This handles batching internally in a more efficient way
-            )
+            if USE_COPY:
+                bulkMerge(cursor, "all_verses", ALL_VERSES_COLUMNS, data, "verse_id", """
+                    book = EXCLUDED.book,
+                    chapter = EXCLUDED.chapter,
+                    verse = EXCLUDED.verse,
+                    first_edition = EXCLUDED.first_edition,
+                    second_edition = EXCLUDED.second_edition,
+                    mayhew = EXCLUDED.mayhew,
+                    zeroth_edition = EXCLUDED.zeroth_edition,
+                    kjv = EXCLUDED.kjv,
+                    grebrew = EXCLUDED.grebrew
+                """)
+            else:
+                execute_values(
+                cursor, 
+                insert_query, 
+                data,
+                page_size=50  # This handles batching internally in a more efficient way
+                )
             final_end_time = time.time()
-            print(f"Inserted {len(data)} rows in {final_end_time - start_time:.2f} seconds")
+            if USE_COPY:
+                print(f"Merged {len(data)} rows ({len(idsToAdd)} new, {len(idsToChange)} changed) in {final_end_time - start_time:.2f} seconds")
+            else:
+                print(f"Inserted {len(data)} rows in {final_end_time - start_time:.2f} seconds")
             connection.commit()
         except Exception as e:
             connection.rollback()
+            failed = True
             print(f"Error inserting rows: {e}")
 
     # Now we need to deal with rows where the data has changed
 
-    if len(idsToChange) > 0:
+    if len(idsToChange) > 0 and not USE_COPY:
         try:
             for i in range(0, len(idsToChange), 50):
                 batch_ids = idsToChange[i:i+50]
@@ -345,20 +503,35 @@ def addRawText(connection, bookObject, updateKJV=False):
                 connection.commit()
         except Exception as e:
             connection.rollback()
+            failed = True
             print(f"Error updating rows: {e}")
 
 
+    if len(idsToRemove) > 0:
+        try:
+            cursor.execute("DELETE FROM all_verses WHERE verse_id = ANY(%s)", ([int(id) for id in idsToRemove],))
+            print(f"Deleted {len(idsToRemove)} rows no longer in any text")
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            failed = True
+            print(f"Error deleting rows: {e}")
+
     returnObject = {
             "changes": False,
             "additions": False,
             "idsToAdd": [],
             "idsToChange": [],
+            "idsToRemove": [],
             "oldDict": {},
             "newDict": {},
-            "updateKJVTable": updateKJV
+            "updateKJVTable": updateKJV,
+            "failed": failed
     }
     
-    changeAnything = changeAnything or changeMass
+    # A removed verse still has verses_to_words/words_mass rows to take back
+    # out, so it counts as a change too.
+    changeAnything = changeAnything or changeMass or len(idsToRemove) > 0
     if changeAnything:
         relevantIDs = idsToAdd + idsToChange
         returnObject = {
@@ -366,9 +539,11 @@ def addRawText(connection, bookObject, updateKJV=False):
             "additions": changeMass,
             "idsToAdd": relevantIDs,
             "idsToChange": idsToChange,
+            "idsToRemove": idsToRemove,
             "oldDict": oldDataDict,
             "newDict": newDataDict,
-            "updateKJVTable": updateKJV
+            "updateKJVTable": updateKJV,
+            "failed": failed
         }
     
     return returnObject
@@ -383,12 +558,17 @@ def preprocessLine(line):
     return line
 
 
-def processBookToDict(bookName):
+def getBookFiles(bookName):
     fileDirectory = os.listdir("../texts")
     rightFiles = []
     for file in fileDirectory:
         if file.startswith(bookName):
             rightFiles.append(file)
+    return rightFiles
+
+
+def processBookToDict(bookName):
+    rightFiles = getBookFiles(bookName)
 
     if(len(rightFiles) == 0):
         print("No files found for " + bookName)
@@ -537,21 +717,88 @@ def getMassWordsTuples(object):
     return allWordsMassTuples
 
 
-def processWordAdditions(connection, object):
+def getBookVerseCounts(cursor, book, verseIDs=None):
+    # What verses_to_words currently holds for every edition of this book (or
+    # just of the given all_verses IDs).
+    oldVerseCounts = {}
+    if verseIDs is not None:
+        editionIDs = []
+        for id in verseIDs:
+            for editionNum in ["2", "3", "5", "7"]:
+                editionIDs.append(int(editionNum + id[1:]))
+        cursor.execute(
+            "SELECT verse_id, words, counts FROM verses_to_words WHERE verse_id = ANY(%s)",
+            (editionIDs,)
+        )
+        for verseID, words, counts in cursor.fetchall():
+            oldVerseCounts[verseID] = dict(zip(words or [], counts or []))
+        return oldVerseCounts
+
+    bookID = bookToIDDict[book]
+    ranges = []
+    for editionNum in ["2", "3", "5", "7"]:
+        ranges.append(int(editionNum + bookID + "000000"))
+        ranges.append(int(editionNum + bookID + "999999"))
+    cursor.execute("""
+        SELECT verse_id, words, counts FROM verses_to_words
+        WHERE verse_id BETWEEN %s AND %s OR verse_id BETWEEN %s AND %s
+           OR verse_id BETWEEN %s AND %s OR verse_id BETWEEN %s AND %s
+    """, ranges)
+
+    for verseID, words, counts in cursor.fetchall():
+        oldVerseCounts[verseID] = dict(zip(words or [], counts or []))
+    return oldVerseCounts
+
+
+def processWordAdditions(connection, book, object, verseIDs=None):
+    # Like fix_verse.py, but for a whole book: diff the book's new per-verse
+    # counts against verses_to_words and apply only the delta to words_mass,
+    # so re-running a book is a no-op rather than a double count.
     cursor = connection.cursor()
 
-    # Add to verses_to_words
-    allTuples = []
+    oldVerseCounts = getBookVerseCounts(cursor, book, verseIDs)
+    newVerseCounts = {}
     for id in object["ids"]:
-        thisIDDict = object["verseToWord"][id]
+        newVerseCounts[int(id)] = object["verseToWord"][id]
+
+    changedVerses = []
+    for verseID in newVerseCounts:
+        if newVerseCounts[verseID] != oldVerseCounts.get(verseID):
+            changedVerses.append(verseID)
+    removedVerses = []
+    for verseID in oldVerseCounts:
+        if verseID not in newVerseCounts:
+            removedVerses.append(verseID)
+
+    # headword -> {verse_id: new count in that verse, 0 meaning gone}
+    wordChanges = {}
+    for verseID in changedVerses + removedVerses:
+        oldCounts = oldVerseCounts.get(verseID, {})
+        newCounts = newVerseCounts.get(verseID, {})
+        for word in list(newCounts) + list(oldCounts):
+            if word.strip() == "":
+                continue
+            if newCounts.get(word, 0) != oldCounts.get(word, 0):
+                if word not in wordChanges:
+                    wordChanges[word] = {}
+                wordChanges[word][verseID] = newCounts.get(word, 0)
+
+    print(f"{book}: {len(changedVerses)} verses changed, {len(removedVerses)} removed, {len(wordChanges)} headwords affected")
+    if len(changedVerses) == 0 and len(removedVerses) == 0:
+        cursor.close()
+        return
+
+    # verses_to_words: replace the changed rows, drop the removed ones
+    allTuples = []
+    for verseID in changedVerses:
+        thisIDDict = newVerseCounts[verseID]
         wordList = alphabetizeMass(thisIDDict.keys())
         countList = []
         for word in wordList:
             countList.append(thisIDDict[word])
-        tuple = (int(id), wordList, countList)
+        tuple = (verseID, wordList, countList)
         allTuples.append(tuple)
     
-    # Batch insert into verses_to_words
     insert_query = """
         INSERT INTO verses_to_words (verse_id, words, counts)
         VALUES %s
@@ -562,30 +809,81 @@ def processWordAdditions(connection, object):
     """
     
     try:
-        execute_values(cursor, insert_query, allTuples)
+        if USE_COPY:
+            bulkMerge(cursor, "verses_to_words", ["verse_id", "words", "counts"], allTuples, "verse_id", """
+                words = EXCLUDED.words,
+                counts = EXCLUDED.counts
+            """)
+        else:
+            execute_values(cursor, insert_query, allTuples)
+        if len(removedVerses) > 0:
+            cursor.execute("DELETE FROM verses_to_words WHERE verse_id = ANY(%s)", (removedVerses,))
         connection.commit()
     except Exception as e:
         connection.rollback()
         raise Exception(f"Error inserting into verses_to_words: {str(e)}")
 
-    # add to words_mass
-    allWordsMassTuples = getMassWordsTuples(object)
+    # words_mass: apply each headword's per-verse changes to its arrays
+    cursor.execute(
+        "SELECT headword, verses, counts FROM words_mass WHERE headword = ANY(%s)",
+        (list(wordChanges.keys()),)
+    )
+    existingWords = {}
+    for headword, verses, counts in cursor.fetchall():
+        existingWords[headword] = (list(verses or []), list(counts or []))
+
+    allWordsMassTuples = []
+    emptiedWords = []
+    for word in wordChanges:
+        verses, counts = existingWords.get(word, ([], []))
+        positions = {}
+        for i in range(len(verses)):
+            positions[verses[i]] = i
+        for verseID in wordChanges[word]:
+            newCount = wordChanges[word][verseID]
+            if verseID in positions:
+                counts[positions[verseID]] = newCount
+            elif newCount > 0:
+                positions[verseID] = len(verses)
+                verses.append(verseID)
+                counts.append(newCount)
+
+        keptVerses = []
+        keptCounts = []
+        for i in range(len(verses)):
+            if counts[i] > 0:
+                keptVerses.append(verses[i])
+                keptCounts.append(counts[i])
+
+        if len(keptVerses) == 0:
+            emptiedWords.append(word)
+            continue
+        lemma = "" # For now.
+        editionNum = 1 # fix this later
+        tuple = (word, keptVerses, keptCounts, lemma, cleanDiacritics(word), editionNum, sum(keptCounts))
+        allWordsMassTuples.append(tuple)
 
     words_query = """
         INSERT INTO words_mass (headword, verses, counts, lemma, no_diacritics, editions, total_count)
         VALUES %s
         ON CONFLICT (headword)
         DO UPDATE SET 
-            verses = words_mass.verses || EXCLUDED.verses,
-            counts = words_mass.counts || EXCLUDED.counts,
-            lemma = EXCLUDED.lemma,
-            no_diacritics = EXCLUDED.no_diacritics,
-            editions = EXCLUDED.editions,
-            total_count = words_mass.total_count + EXCLUDED.total_count
+            verses = EXCLUDED.verses,
+            counts = EXCLUDED.counts,
+            total_count = EXCLUDED.total_count
     """
     
     try:
-        execute_values(cursor, words_query, allWordsMassTuples)
+        if USE_COPY:
+            bulkMerge(cursor, "words_mass", WORDS_MASS_COLUMNS, allWordsMassTuples, "headword", """
+                verses = EXCLUDED.verses,
+                counts = EXCLUDED.counts,
+                total_count = EXCLUDED.total_count
+            """)
+        else:
+            execute_values(cursor, words_query, allWordsMassTuples)
+        if len(emptiedWords) > 0:
+            cursor.execute("DELETE FROM words_mass WHERE headword = ANY(%s)", (emptiedWords,))
         connection.commit()
     except Exception as e:
         connection.rollback()
@@ -593,25 +891,86 @@ def processWordAdditions(connection, object):
     finally:
         cursor.close()
     
-def main(book=""):
-    connection = psycopg2.connect(DATABASE_URL)
+def prepareBook(book):
+    # Everything main() does for a book that doesn't need the database, so
+    # fullReset can run it in a worker process. The word additions cover the
+    # whole book; main only passes them on when it diffs the whole book.
+    # Whatever the parse prints is handed back too, so fullReset can print it
+    # in book order instead of letting the workers interleave.
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        bookObject = processBookToDict(book)
+        wordAdditionObject = None
+        if bookObject is not None:
+            newDataList, newDataDict = getVerseTuples(bookObject)
+            wordAdditionObject = getWordAdditions({"newDict": newDataDict})
+    return bookObject, wordAdditionObject, output.getvalue()
+
+
+def ingestBook(connection, book, bookObject, startAddBookTime, wordAdditionObject=None, verseIDs=None):
+    # Returns False if writing the raw text failed (so the manifest isn't updated).
+    rawTextChangeObject = addRawText(connection, bookObject, verseIDs=verseIDs)
+    endAddBookTime = time.time()
+    print(f"Finished processing text in {book} in {endAddBookTime - startAddBookTime:.2f} seconds")
+
+    if not rawTextChangeObject["changes"]:
+        print(f"No Massachusett text changed in {book}")
+        return not rawTextChangeObject["failed"]
+
+    startWordTime = time.time()
+    if wordAdditionObject is None:
+        wordAdditionObject = getWordAdditions(rawTextChangeObject)
+    processWordAdditions(connection, book, wordAdditionObject, verseIDs)
+    endWordTime = time.time()
+    print(f"Finished processing words from {book} in {endWordTime - startWordTime:.2f} seconds")
+    return not rawTextChangeObject["failed"]
+
+
+def main(book="", connection=None, prepared=None):
+    # prepared is prepareBook(book)'s result when fullReset parsed the book in
+    # a worker; it stands in for the parse below.
     if book == "":
         book = input("Enter book name: ")
 
     startAddBookTime = time.time()
-    bookObject = processBookToDict(book)
+    manifest = loadManifest()
+    fileStates = getFileStates(book, manifest.get(book))
+    if book in manifest and sameFileHashes(fileStates, manifest[book]["files"]):
+        # Only the mtimes can have moved; remember them so we don't rehash next time.
+        manifest[book]["files"] = fileStates
+        saveManifest(manifest)
+        print(f"{book} is unchanged since it was last ingested, skipping")
+        return
+
+    wordAdditionObject = None
+    if prepared is None:
+        bookObject = processBookToDict(book)
+    else:
+        bookObject, wordAdditionObject, output = prepared
+        print(output, end="")
     if bookObject is None:
         return
-    
-    rawTextChangeObject = addRawText(connection, bookObject)
-    endAddBookTime = time.time()
-    print(f"Finished processing text in {book} in {endAddBookTime - startAddBookTime:.2f} seconds")
 
-    startWordTime = time.time()
-    wordAdditionObject = getWordAdditions(rawTextChangeObject)
-    processWordAdditions(connection, wordAdditionObject)
-    endWordTime = time.time()
-    print(f"Finished processing words from {book} in {endWordTime - startWordTime:.2f} seconds")
+    newDataList, newDataDict = getVerseTuples(bookObject)
+    verseHashes = getVerseHashes(newDataDict)
+    verseIDs = None
+    if book in manifest:
+        oldHashes = manifest[book]["verses"]
+        verseIDs = set()
+        for id in verseHashes:
+            if oldHashes.get(id) != verseHashes[id]:
+                verseIDs.add(id)
+        for id in oldHashes:
+            if id not in verseHashes:
+                verseIDs.add(id)
+        print(f"{book}: {len(verseIDs)} verses have changed since the last ingest")
+        wordAdditionObject = None
+
+    if connection is None:
+        connection = psycopg2.connect(DATABASE_URL)
+    if ingestBook(connection, book, bookObject, startAddBookTime, wordAdditionObject, verseIDs):
+        manifest[book] = {"files": fileStates, "verses": verseHashes}
+        saveManifest(manifest)
 
 
     '''
@@ -734,12 +1093,20 @@ def addAllKJV(connection):
                 totalWords += 1
     print(f"Total words in KJV: {totalWords}")
 
-def fullReset():
+def fullReset(jobs=1):
     outerStartTime = time.time()
     connection = psycopg2.connect(DATABASE_URL)
     clear_tables(connection)
-    for book in allBookList:
-        main(book)
+    if jobs > 1:
+        # Parse and tokenize in the pool; imap hands the books back in
+        # allBookList order and main does the rest on this one connection,
+        # so the tables, manifest and log come out as the serial loop's would.
+        with multiprocessing.Pool(jobs) as pool:
+            for book, prepared in zip(allBookList, pool.imap(prepareBook, allBookList)):
+                main(book, connection, prepared)
+    else:
+        for book in allBookList:
+            main(book, connection)
     
     
     totalWords = getNumWords(connection)
@@ -757,8 +1124,179 @@ def resetKJV():
 
     print(f"Total time for all books: {time.time() - outerStartTime:.2f} seconds")
 
+class CountingCursor(psycopg2.extensions.cursor):
+    statements = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.statements += 1
+        return super().execute(query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        CountingCursor.statements += 1
+        return super().copy_expert(sql, file, size)
+
+
+def getTableChecksums(connection):
+    cursor = connection.cursor()
+    checksums = {}
+    for table, key in [("all_verses", "verse_id"), ("verses_to_words", "verse_id"), ("words_mass", "headword")]:
+        cursor.execute(f"SELECT COUNT(*), md5(string_agg(t::text, '|' ORDER BY {key})) FROM {table} t")
+        checksums[table] = cursor.fetchone()
+    cursor.close()
+    return checksums
+
+
+def benchmarkBulkLoad(books=allBookList):
+    # Load the same books through execute_values and then through COPY, and
+    # check both leave identical tables. Point DATABASE_URL at a scratch DB.
+    global USE_COPY
+    areYouSure = input("THE BENCHMARK DELETES EVERYTHING IN all_verses, verses_to_words AND words_mass.\nIF YOU'RE SURE, TYPE 'YES' (ALL CAPS): ")
+    if areYouSure != "YES":
+        print("Aborting")
+        return
+
+    connection = psycopg2.connect(DATABASE_URL, cursor_factory=CountingCursor)
+    results = {}
+    for label, useCopy in [("execute_values", False), ("COPY", True)]:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM all_verses; DELETE FROM verses_to_words; DELETE FROM words_mass;")
+        connection.commit()
+        cursor.close()
+        saveManifest({})
+
+        USE_COPY = useCopy
+        CountingCursor.statements = 0
+        startTime = time.time()
+        for book in books:
+            main(book, connection)
+        elapsed = time.time() - startTime
+        results[label] = (CountingCursor.statements, elapsed, getTableChecksums(connection))
+
+    print(f"\n{'path':<16}{'statements':>12}{'seconds':>10}")
+    for label in results:
+        statements, elapsed, checksums = results[label]
+        print(f"{label:<16}{statements:>12}{elapsed:>10.2f}")
+    if results["execute_values"][2] == results["COPY"][2]:
+        print("Both paths produced identical tables.")
+    else:
+        print("WARNING: the two paths produced different tables:")
+        for table in results["COPY"][2]:
+            print(f"  {table}: {results['execute_values'][2][table]} vs {results['COPY'][2][table]}")
+
+
+def checkVerseRemoval(book="Jude"):
+    # Take one verse out of the book, once through the manifest path (verseIDs)
+    # and once through the full-book diff, and check its words come back out of
+    # verses_to_words and words_mass. Re-ingests the book after each, so point
+    # DATABASE_URL at a scratch DB.
+    areYouSure = input(f"THE CHECK REWRITES {book.upper()} IN all_verses, verses_to_words AND words_mass.\nIF YOU'RE SURE, TYPE 'YES' (ALL CAPS): ")
+    if areYouSure != "YES":
+        print("Aborting")
+        return
+
+    connection = psycopg2.connect(DATABASE_URL)
+    ingestBook(connection, book, processBookToDict(book), time.time())
+    checksums = getTableChecksums(connection)
+    cursor = connection.cursor()
+    # A re-added verse goes on the end of each words_mass array, so compare
+    # those per verse rather than by checksum.
+    cursor.execute("SELECT headword, verses, counts, total_count FROM words_mass")
+    massRows = {}
+    for headword, verses, counts, totalCount in cursor.fetchall():
+        massRows[headword] = (dict(zip(verses, counts)), totalCount)
+
+    bookObject = processBookToDict(book)
+    newDataList, newDataDict = getVerseTuples(bookObject)
+    wordAdditionObject = getWordAdditions({"newDict": newDataDict})
+    # The verse with the most Massachusett words, so there's something to take out.
+    removedID = max(newDataList, key=lambda id: sum(
+        sum(wordAdditionObject["verseToWord"].get(editionNum + id[1:], {}).values()) for editionNum in ["2", "3", "5", "7"]
+    ))
+    removedCounts = {}
+    editionIDs = []
+    for editionNum in ["2", "3", "5", "7"]:
+        editionID = editionNum + removedID[1:]
+        editionIDs.append(int(editionID))
+        for word, count in wordAdditionObject["verseToWord"].get(editionID, {}).items():
+            removedCounts[word] = removedCounts.get(word, 0) + count
+
+    allPassed = True
+    for label, verseIDs in [("manifest", {removedID}), ("full book", None)]:
+        cursor.execute("SELECT headword, verses, total_count FROM words_mass WHERE headword = ANY(%s)", (list(removedCounts.keys()),))
+        before = {}
+        for headword, verses, totalCount in cursor.fetchall():
+            before[headword] = (len(verses), totalCount)
+
+        smallerBook = processBookToDict(book)
+        smallerBook["IDs"].remove(removedID)
+        del smallerBook["dict"][removedID]
+        ingestBook(connection, book, smallerBook, time.time(), verseIDs=verseIDs)
+
+        cursor.execute("SELECT headword, verses, total_count FROM words_mass WHERE headword = ANY(%s)", (list(removedCounts.keys()),))
+        after = {}
+        for headword, verses, totalCount in cursor.fetchall():
+            after[headword] = (len(verses), totalCount, set(verses) & set(editionIDs))
+        problems = []
+        for word in removedCounts:
+            expectedCount = before[word][1] - removedCounts[word]
+            if expectedCount == 0:
+                if word in after:
+                    problems.append(f"{word} should have been deleted")
+                continue
+            versesLeft, totalCount, stillThere = after.get(word, (0, 0, set()))
+            if totalCount != expectedCount:
+                problems.append(f"{word}: total_count {before[word][1]} -> {totalCount}, expected {expectedCount}")
+            if len(stillThere) > 0 or versesLeft >= before[word][0]:
+                problems.append(f"{word}: verses still lists {sorted(stillThere)}")
+        cursor.execute("SELECT COUNT(*) FROM all_verses WHERE verse_id = %s", (int(removedID),))
+        if cursor.fetchone()[0] != 0:
+            problems.append("all_verses row is still there")
+        cursor.execute("SELECT COUNT(*) FROM verses_to_words WHERE verse_id = ANY(%s)", (editionIDs,))
+        if cursor.fetchone()[0] != 0:
+            problems.append("verses_to_words rows are still there")
+
+        ingestBook(connection, book, processBookToDict(book), time.time())
+        newChecksums = getTableChecksums(connection)
+        cursor.execute("SELECT headword, verses, counts, total_count FROM words_mass")
+        newMassRows = {}
+        for headword, verses, counts, totalCount in cursor.fetchall():
+            newMassRows[headword] = (dict(zip(verses, counts)), totalCount)
+        for table in ["all_verses", "verses_to_words"]:
+            if newChecksums[table] != checksums[table]:
+                problems.append(f"re-ingesting the book didn't restore {table}")
+        if newMassRows != massRows:
+            problems.append("re-ingesting the book didn't restore words_mass")
+
+        if len(problems) == 0:
+            print(f"{label}: removing {removedID} took {sum(removedCounts.values())} words of {len(removedCounts)} headwords back out")
+        else:
+            allPassed = False
+            print(f"WARNING: {label}: removing {removedID} went wrong:")
+            for problem in problems:
+                print(f"  {problem}")
+    cursor.close()
+    return allPassed
+
+
+def getJobsArg():
+    if "--jobs" in sys.argv:
+        return int(sys.argv[sys.argv.index("--jobs") + 1])
+    return 1
+
 #print("test|1|2".replace("|", " "))
 
-fullReset()
-#resetKJV()
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmarkBulkLoad()
+    elif "--check-removal" in sys.argv:
+        index = sys.argv.index("--check-removal")
+        if index + 1 < len(sys.argv) and not sys.argv[index + 1].startswith("--"):
+            passed = checkVerseRemoval(sys.argv[index + 1])
+        else:
+            passed = checkVerseRemoval()
+        if passed is False:
+            sys.exit(1)
+    else:
+        fullReset(getJobsArg())
+    #resetKJV()
 
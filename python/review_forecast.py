@@ -0,0 +1,130 @@
+"""
+Forecast how many cards each deck will have due per day over the next N days.
+
+Loads every deck's scheduled cards once (stability, difficulty, last review,
+due date), then steps through the days: each day the cards falling due are
+reviewed — pass with probability --pass-rate, fail otherwise — and rescheduled
+with schedule_cards_batch, the same FSRS formulas submit uses. All decks are
+simulated together as one set of arrays, so a day costs a handful of NumPy
+operations however many decks there are.
+
+Day 0 is the rest of today and includes the overdue backlog; each later day
+runs midnight to midnight UTC, with its reviews done at the start of the day.
+Suspended cards and cards that were never scheduled (no time_due) are left out.
+
+Run with:
+  py -3.12 python/review_forecast.py                  # all decks, 30 days, 90% pass
+  py -3.12 python/review_forecast.py Akkadian --days 60 --pass-rate 0.85
+  py -3.12 python/review_forecast.py --seed 7         # different random outcomes
+"""
+
+import sys
+import time
+import numpy as np
+from datetime import datetime, timezone, timedelta
+
+from simulate_submit import connect, schedule_cards_batch
+
+ARGS = []
+FLAG_VALUES = ('--days', '--pass-rate', '--seed')
+for i, arg in enumerate(sys.argv[1:], 1):
+    if not arg.startswith('--') and sys.argv[i - 1] not in FLAG_VALUES:
+        ARGS.append(arg)
+DECK = ARGS[0] if ARGS else None
+
+def get_flag_value(flag, default):
+    return type(default)(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+DAYS = get_flag_value('--days', 30)
+PASS_RATE = get_flag_value('--pass-rate', 0.9)
+SEED = get_flag_value('--seed', 0)
+
+BAR_WIDTH = 40
+DAY = 86400
+
+
+def load_cards(deck=None):
+    """Deck names, and per card: deck index, stability, difficulty,
+    last_reviewed and time_due (epoch seconds, NaN for NULL)."""
+    conn = connect()
+    cur = conn.cursor()
+    # Epochs are computed in SQL: corrupt time_due values (see
+    # fix_corrupt_intervals) are past the year Python's datetime can hold.
+    cur.execute(f"""
+        SELECT deck, stability, difficulty,
+               EXTRACT(EPOCH FROM last_reviewed)::float8,
+               EXTRACT(EPOCH FROM time_due)::float8
+        FROM cards
+        WHERE time_due IS NOT NULL AND is_suspended IS NOT TRUE
+        {"AND deck = %s" if deck else ""}
+    """, (deck,) if deck else ())
+    rows = cur.fetchall()
+    conn.close()
+
+    decks, deck_index = np.unique(np.array([r[0] for r in rows], dtype=object).astype(str), return_inverse=True)
+    values = np.array([r[1:] for r in rows], dtype=float).reshape(len(rows), 4)  # None -> NaN
+    return list(decks), deck_index, values[:, 0], values[:, 1], values[:, 2], values[:, 3]
+
+
+def forecast(deck_index, stability, difficulty, last_reviewed, time_due, deck_count, now, days, pass_rate, rng):
+    """(deck_count x days) array of cards due per day. A card with no
+    stability is scheduled as a first review, as submit would."""
+    S, D, last, due = stability.copy(), difficulty.copy(), last_reviewed.copy(), time_due.copy()
+    midnight = datetime(now.year, now.month, now.day, tzinfo=timezone.utc).timestamp()
+    counts = np.zeros((deck_count, days), dtype=int)
+
+    for day in range(days):
+        day_start = now.timestamp() if day == 0 else midnight + day * DAY
+        day_end = midnight + (day + 1) * DAY
+        due_today = np.nonzero(due < day_end)[0]
+        if len(due_today) == 0:
+            continue
+        counts[:, day] = np.bincount(deck_index[due_today], minlength=deck_count)
+
+        grades = np.where(rng.random(len(due_today)) < pass_rate, 3, 1)
+        result = schedule_cards_batch(S[due_today], D[due_today], last[due_today], grades,
+                                      np.full(len(due_today), day_start))
+        S[due_today] = result['new_stability']
+        D[due_today] = result['new_difficulty']
+        last[due_today] = day_start
+        due[due_today] = result['new_due']
+    return counts
+
+
+def print_histogram(title, counts, now):
+    print(f"\n{'='*60}")
+    print(f"  {title}: {counts.sum()} reviews in {len(counts)} days, peak {counts.max()}/day")
+    print('='*60)
+    scale = BAR_WIDTH / max(counts.max(), 1)
+    start = now.date()
+    for day, count in enumerate(counts):
+        date = start + timedelta(days=day)
+        bar = "█" * int(round(count * scale))
+        print(f"  {date}  {count:>6}  {bar}")
+
+
+def main():
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    decks, deck_index, stability, difficulty, last_reviewed, time_due = load_cards(DECK)
+    load_time = time.perf_counter() - start
+    if not decks:
+        print("No scheduled cards found" + (f" in deck {DECK!r}." if DECK else "."))
+        return
+
+    start = time.perf_counter()
+    counts = forecast(deck_index, stability, difficulty, last_reviewed, time_due, len(decks),
+                      now, DAYS, PASS_RATE, np.random.default_rng(SEED))
+    simulate_time = time.perf_counter() - start
+
+    for d, deck in enumerate(decks):
+        print_histogram(deck, counts[d], now)
+    if len(decks) > 1:
+        print_histogram("All decks", counts.sum(axis=0), now)
+
+    print(f"\n{len(stability)} cards in {len(decks)} deck(s), {DAYS} days at {PASS_RATE:.0%} pass rate: "
+          f"loaded in {load_time:.2f}s, simulated in {simulate_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
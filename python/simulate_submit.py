@@ -3,23 +3,40 @@ Simulate the submit_review_results transaction for the active Akkadian session
 to find exactly where it throws. Runs inside a transaction that is always
 rolled back at the end — safe to run without modifying anything.
 
-Run with: py -3.12 python/simulate_submit.py [deck] [session_id]
+Run with: py -3.12 python/simulate_submit.py [deck] [session_id] [--batched | --compare]
 Defaults: Akkadian, latest in-progress session that has pending rows.
+
+--batched  send each table's writes as one UPDATE ... FROM unnest(...) statement
+           (scheduling via schedule_cards_batch) instead of one UPDATE per row
+--compare  run the transaction both ways (each rolled back) and report
+           statement counts and wall time side by side
 """
 
 import sys
 import os
 import math
+import time
+import numpy as np
 import psycopg2
 import psycopg2.extras
 from datetime import datetime, timezone, timedelta
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
-if not DATABASE_URL:
-    raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
 
-DECK = sys.argv[1] if len(sys.argv) > 1 else 'Akkadian'
-SESSION_ID = int(sys.argv[2]) if len(sys.argv) > 2 else None
+def connect():
+    # Checked here rather than at import so the FSRS code below can be
+    # imported (e.g. by fsrs_optimizer) without a database.
+    if not DATABASE_URL:
+        raise SystemExit("DATABASE_URL is not set. Export it (its value is in python/vars.env) before running.")
+    return psycopg2.connect(DATABASE_URL)
+
+# Only our own command line; fsrs_optimizer imports this module with its own.
+ARGV = sys.argv[1:] if __name__ == '__main__' else []
+ARGS = [a for a in ARGV if not a.startswith('--')]
+DECK = ARGS[0] if len(ARGS) > 0 else 'Akkadian'
+SESSION_ID = int(ARGS[1]) if len(ARGS) > 1 else None
+BATCHED = '--batched' in ARGV
+COMPARE = '--compare' in ARGV
 
 # ── FSRS constants (same as scheduler.ts) ─────────────────────────────────
 W = [0.40255,1.18385,3.173,15.69105,7.1949,0.5345,1.4604,0.0046,1.54575,
@@ -93,6 +110,102 @@ def schedule_card(card, grade, reviewed_at):
     return {'new_interval': new_interval, 'new_stability': stability,
             'new_difficulty': difficulty, 'new_retrievability': 1.0, 'new_due': new_due}
 
+# ── Batched FSRS (NumPy) ──────────────────────────────────────────────────
+# schedule_card over a whole deck at once. Same formulas, same order of
+# operations, so results agree with the scalar version to float rounding.
+
+GRADE_RATINGS = {'pass': 3, 'hard': 2, 'fail': 1}
+
+def to_epoch_seconds(moment):
+    """datetime (naive = UTC, as schedule_card assumes) or None -> float, NaN for None."""
+    if moment is None:
+        return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def cards_to_arrays(cards):
+    """cards rows (dicts with stability, difficulty, last_reviewed) -> the
+    stability, difficulty and last_reviewed arrays schedule_cards_batch takes.
+    NULLs become NaN."""
+    stability = np.array([math.nan if c['stability'] is None else c['stability'] for c in cards], dtype=float)
+    difficulty = np.array([math.nan if c['difficulty'] is None else c['difficulty'] for c in cards], dtype=float)
+    last_reviewed = np.array([to_epoch_seconds(c['last_reviewed']) for c in cards], dtype=float)
+    return stability, difficulty, last_reviewed
+
+def grades_to_ratings(grades):
+    """'pass'/'hard'/'fail' strings (anything else is a fail) or 1-4 ratings -> int array."""
+    grades = np.asarray(grades)
+    if grades.dtype.kind in 'iuf':
+        return grades.astype(int)
+    distinct, inverse = np.unique(grades.astype(str), return_inverse=True)
+    distinct_ratings = np.array([GRADE_RATINGS.get(g.lower(), 1) for g in distinct], dtype=int)
+    return distinct_ratings[inverse].reshape(grades.shape)
+
+def initial_difficulty_batch(rating):
+    return np.clip(W[4] - np.exp(W[5] * (rating - 1)) + 1, 1, 10)
+
+def schedule_cards_batch(stability, difficulty, last_reviewed, grades, reviewed_at):
+    """Vectorized schedule_card. stability/difficulty: the cards' current
+    values (NaN = NULL, i.e. a new card); last_reviewed: epoch seconds (NaN =
+    NULL); grades: strings or ratings; reviewed_at: a datetime, or epoch
+    seconds per card. Returns a dict of arrays with schedule_card's keys;
+    new_due is epoch seconds."""
+    S = np.asarray(stability, dtype=float)
+    D = np.asarray(difficulty, dtype=float)
+    last = np.asarray(last_reviewed, dtype=float)
+    rating = grades_to_ratings(grades)
+    if isinstance(reviewed_at, datetime):
+        now = np.full(S.shape, to_epoch_seconds(reviewed_at))
+    else:
+        now = np.asarray(reviewed_at, dtype=float)
+
+    is_first = np.isnan(S)
+    W_arr = np.asarray(W)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # recalc_retrievability, or 0.9 with no last review; floored at 0.01
+        diff_days = np.maximum(0, (now - last) / 86400)
+        F, C = 19/81, -0.5
+        R = np.where(np.isnan(last), 0.9, (1 + F * diff_days / S) ** C)
+        R = np.where(np.isnan(R), 0.01, np.maximum(0.01, R))
+
+        old_S = S
+        old_D = np.where(np.isnan(D) | (D == 0), 5, D)  # card['difficulty'] or 5
+
+        # stability_on_success
+        t_d = 11 - old_D
+        t_s = old_S ** (-W[9])
+        t_r = np.exp(W[10] * (1 - R)) - 1
+        H = np.where(rating == 2, W[15], 1)
+        B = np.where(rating == 4, W[16], 1)
+        success = old_S * (1 + t_d * t_s * t_r * H * B * math.exp(W[8]))
+
+        # stability_on_failure
+        failure = np.minimum(old_S, old_D ** (-W[12]) * ((old_S + 1) ** W[13] - 1) * np.exp(W[14] * (1 - R)) * W[11])
+
+        # review_difficulty
+        delta = (0 - W[6]) * (rating - 3)
+        d_prime = old_D + delta * ((10 - old_D) / 9)
+        reviewed_D = np.clip(W[7] * get_initial_difficulty(4) + (1 - W[7]) * d_prime, 1, 10)
+
+        first_rating = np.clip(rating, 1, 4)
+        new_S = np.where(is_first, W_arr[first_rating - 1], np.where(rating > 1, success, failure))
+        new_D = np.where(is_first, initial_difficulty_batch(first_rating), reviewed_D)
+
+        new_S = np.where(np.isnan(new_S) | (new_S <= 0), W[2], new_S)
+        new_D = np.where(np.isnan(new_D), 5, new_D)
+        new_S = np.minimum(new_S, MAX_INTERVAL_DAYS)
+
+        # update_interval
+        ms = new_S * ((RETENTION ** (1/C)) - 1) / F * 86400000
+        days = np.ceil(ms / 86400000)
+        new_interval = np.clip(days, 1, MAX_INTERVAL_DAYS).astype(int)
+
+    return {'new_interval': new_interval, 'new_stability': new_S,
+            'new_difficulty': new_D, 'new_retrievability': np.ones(S.shape),
+            'new_due': now + new_interval * 86400.0}
+
 # ── Main ───────────────────────────────────────────────────────────────────
 
 def step(label):
@@ -105,8 +218,23 @@ def fail(e):
     print(f"\n  ✗ FAILED: {e}")
     raise
 
+class CountingCursor(psycopg2.extras.RealDictCursor):
+    """RealDictCursor that counts its statements and the time spent in them."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = 0
+        self.seconds = 0.0
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.statements += 1
+            self.seconds += time.perf_counter() - start
+
 def main():
-    conn = psycopg2.connect(DATABASE_URL)
+    conn = connect()
     conn.autocommit = False
     psycopg2.extras.register_default_jsonb(conn)
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -132,8 +260,34 @@ def main():
         session_id = row['session_id']
 
     print(f"  Using session_id={session_id}")
+    cur.close()
+
+    if not COMPARE:
+        simulate_transaction(conn, session_id, BATCHED)
+        conn.close()
+        return
+
+    runs = {}
+    for label, batched in (('per-row', False), ('batched', True)):
+        print(f"\n── {label} ──")
+        runs[label] = simulate_transaction(conn, session_id, batched, show_cards=False)
+    conn.close()
 
+    print(f"\n{'path':<10} {'statements':>10} {'in SQL':>9} {'wall':>9}")
+    for label, stats in runs.items():
+        if stats is None:
+            print(f"{label:<10} {'failed':>10}")
+        else:
+            print(f"{label:<10} {stats['statements']:>10} {stats['sql_seconds']:>8.3f}s {stats['wall_seconds']:>8.3f}s")
+
+def simulate_transaction(conn, session_id, batched, show_cards=True):
+    """Steps 1-10 of submit_review_results for session_id, always rolled back.
+    Returns the statement count, time spent in SQL and wall time of the
+    transaction, or None if a step threw."""
+    cur = conn.cursor(cursor_factory=CountingCursor)
     reviewed_at = datetime.now(timezone.utc)
+    stats = None
+    print(f"  Writes: {'batched (one statement per table)' if batched else 'one UPDATE per row'}")
 
     try:
         # ── Step 1: get results from session_card_reviews ────────────────
@@ -151,6 +305,8 @@ def main():
 
         # ── Step 2: BEGIN ─────────────────────────────────────────────────
         step("BEGIN")
+        cur.statements, cur.seconds = 0, 0.0
+        start = time.perf_counter()
         cur.execute("BEGIN")
         ok()
 
@@ -174,31 +330,63 @@ def main():
         # ── Step 5: FSRS scheduling ───────────────────────────────────────
         step("FSRS scheduling")
         scheduled = {}
-        for r in results:
-            cid = r['cardId']
-            card = db_cards[cid]
-            sched = schedule_card(card, r['result'], reviewed_at)
-            scheduled[cid] = sched
-            print(f"\n      card {cid}: interval {card['interval']} → {sched['new_interval']}d"
-                  f"  stability {card['stability']:.2f} → {sched['new_stability']:.2f}", end='')
+        if batched:
+            result_ids = [r['cardId'] for r in results]
+            batch = schedule_cards_batch(*cards_to_arrays([db_cards[cid] for cid in result_ids]),
+                                         [r['result'] for r in results], reviewed_at)
+            for i, cid in enumerate(result_ids):
+                scheduled[cid] = {key: values[i].item() for key, values in batch.items()}
+        else:
+            for r in results:
+                cid = r['cardId']
+                card = db_cards[cid]
+                sched = schedule_card(card, r['result'], reviewed_at)
+                scheduled[cid] = sched
+                if show_cards:
+                    print(f"\n      card {cid}: interval {card['interval']} → {sched['new_interval']}d"
+                          f"  stability {card['stability']:.2f} → {sched['new_stability']:.2f}", end='')
         ok()
 
         # ── Step 6: UPDATE cards (FSRS results) ───────────────────────────
         step("UPDATE cards (FSRS + under_review=false + reviewed_today=true)")
-        for cid, sched in scheduled.items():
+        if batched:
+            # new_due is epoch seconds here; to_timestamp gives the same
+            # timestamptz the per-row path sends as an aware datetime.
+            ids = list(scheduled)
             cur.execute("""
-                UPDATE cards
-                SET time_due      = %s,
-                    interval      = %s,
-                    retrievability = %s,
-                    stability     = %s,
-                    difficulty    = %s,
+                UPDATE cards AS c
+                SET time_due      = to_timestamp(u.due),
+                    interval      = u.interval,
+                    retrievability = u.retrievability,
+                    stability     = u.stability,
+                    difficulty    = u.difficulty,
                     under_review  = false,
                     last_reviewed = %s,
                     reviewed_today = true
-                WHERE card_id = %s
-            """, (sched['new_due'], sched['new_interval'], sched['new_retrievability'],
-                  sched['new_stability'], sched['new_difficulty'], reviewed_at, cid))
+                FROM unnest(%s::int[], %s::float8[], %s::int8[], %s::float8[], %s::float8[], %s::float8[])
+                     AS u(card_id, due, interval, retrievability, stability, difficulty)
+                WHERE c.card_id = u.card_id
+            """, (reviewed_at, ids,
+                  [scheduled[cid]['new_due'] for cid in ids],
+                  [scheduled[cid]['new_interval'] for cid in ids],
+                  [scheduled[cid]['new_retrievability'] for cid in ids],
+                  [scheduled[cid]['new_stability'] for cid in ids],
+                  [scheduled[cid]['new_difficulty'] for cid in ids]))
+        else:
+            for cid, sched in scheduled.items():
+                cur.execute("""
+                    UPDATE cards
+                    SET time_due      = %s,
+                        interval      = %s,
+                        retrievability = %s,
+                        stability     = %s,
+                        difficulty    = %s,
+                        under_review  = false,
+                        last_reviewed = %s,
+                        reviewed_today = true
+                    WHERE card_id = %s
+                """, (sched['new_due'], sched['new_interval'], sched['new_retrievability'],
+                      sched['new_stability'], sched['new_difficulty'], reviewed_at, cid))
         ok()
 
         # ── Step 7: peer boost ─────────────────────────────────────────────
@@ -227,15 +415,27 @@ def main():
                     pi = peer_map.get(cp['peer_id'])
                     if pi and pi['note_id'] == cp['note_id']:
                         to_boost.add(cp['peer_id'])
+                boosts = []
                 for peer_id in to_boost:
                     peer = peer_map[peer_id]
                     interval = peer['interval'] or 1
                     boost = max(math.floor(interval * 0.05), 1)
                     new_interval = interval + boost
                     new_due = datetime.fromisoformat(str(peer['time_due'])) + timedelta(days=boost)
-                    cur.execute("""
-                        UPDATE cards SET interval = %s, time_due = %s WHERE card_id = %s
-                    """, (new_interval, new_due, peer['card_id']))
+                    boosts.append((peer['card_id'], new_interval, new_due))
+                if batched:
+                    if boosts:
+                        peer_ids, new_intervals, new_dues = zip(*boosts)
+                        cur.execute("""
+                            UPDATE cards AS c SET interval = u.interval, time_due = u.time_due
+                            FROM unnest(%s::int[], %s::int8[], %s::timestamp[]) AS u(card_id, interval, time_due)
+                            WHERE c.card_id = u.card_id
+                        """, (list(peer_ids), list(new_intervals), list(new_dues)))
+                else:
+                    for peer_card_id, new_interval, new_due in boosts:
+                        cur.execute("""
+                            UPDATE cards SET interval = %s, time_due = %s WHERE card_id = %s
+                        """, (new_interval, new_due, peer_card_id))
                 ok(f"(boosted {len(to_boost)} peer cards)")
             else:
                 ok("(no peers outside reviewed set)")
@@ -267,33 +467,56 @@ def main():
 
         # ── Step 10: UPDATE session_card_reviews ──────────────────────────
         step("UPDATE session_card_reviews (under_review=false)")
-        for r in results:
-            sched = scheduled[r['cardId']]
+        if batched:
             cur.execute("""
-                UPDATE session_card_reviews
+                UPDATE session_card_reviews AS s
                 SET reviewed_at       = %s,
-                    grade             = %s,
-                    interval_after    = %s,
-                    retrievability_after = %s,
+                    grade             = u.grade,
+                    interval_after    = u.interval_after,
+                    retrievability_after = u.retrievability_after,
                     under_review      = false
-                WHERE session_id = %s AND card_id = %s AND deck = %s
-            """, (reviewed_at, r['result'],
-                  sched['new_interval'], sched['new_retrievability'],
-                  session_id, r['cardId'], DECK))
+                FROM unnest(%s::int[], %s::text[], %s::int8[], %s::float8[])
+                     AS u(card_id, grade, interval_after, retrievability_after)
+                WHERE s.session_id = %s AND s.card_id = u.card_id AND s.deck = %s
+            """, (reviewed_at,
+                  [r['cardId'] for r in results],
+                  [r['result'] for r in results],
+                  [scheduled[r['cardId']]['new_interval'] for r in results],
+                  [scheduled[r['cardId']]['new_retrievability'] for r in results],
+                  session_id, DECK))
+        else:
+            for r in results:
+                sched = scheduled[r['cardId']]
+                cur.execute("""
+                    UPDATE session_card_reviews
+                    SET reviewed_at       = %s,
+                        grade             = %s,
+                        interval_after    = %s,
+                        retrievability_after = %s,
+                        under_review      = false
+                    WHERE session_id = %s AND card_id = %s AND deck = %s
+                """, (reviewed_at, r['result'],
+                      sched['new_interval'], sched['new_retrievability'],
+                      session_id, r['cardId'], DECK))
         ok()
 
+        stats = {'statements': cur.statements, 'sql_seconds': cur.seconds,
+                 'wall_seconds': time.perf_counter() - start}
         print("\n\n  ✅ ALL STEPS PASSED — transaction would succeed.")
+        print(f"  ({stats['statements']} statements, {stats['sql_seconds']:.3f}s in SQL, "
+              f"{stats['wall_seconds']:.3f}s wall)")
         print("  (Rolling back so no data is changed.)")
 
     except Exception as e:
         print(f"\n\n  ❌ EXCEPTION: {type(e).__name__}: {e}")
     finally:
         cur.execute("ROLLBACK")
-        conn.close()
+        cur.close()
+    return stats
 
 def find_corrupt_peers():
     """Find peer cards with extreme time_due/interval that break the peer boost."""
-    conn = psycopg2.connect(DATABASE_URL)
+    conn = connect()
     conn.autocommit = True
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
@@ -0,0 +1,157 @@
+"""Trigram index for "which words contain this string" over a vocabulary.
+
+massSearch and kjvhapaxfinder.wordSearch used to test `query in word` against
+every token of every file. This indexes the distinct words of a massIndex
+vocabulary instead: each word is folded (see foldFunctions), every trigram of
+the folded form points at the words containing it, and a query only has to
+check the words that contain all of its trigrams. Queries shorter than three
+characters fall back to a scan of the folded vocabulary, which is still
+~125k distinct words rather than the whole corpus.
+
+Folds (the query is folded the same way as the words):
+    exact           the headword as written
+    noDiacritics    library.cleanDiacritics, the words_mass no_diacritics column
+    8oo             noDiacritics with 8 spelled oo, so "nuppoo" finds nupp8
+
+Each (vocabulary, fold) index is cached under corpusCache/substringIndex/ and
+rebuilt when the vocabulary or the fold's code changes.
+"""
+import hashlib
+import json
+import os
+import struct
+from array import array
+
+from corpus import CACHE_DIR, getTokenizerFingerprint
+from library import cleanDiacritics
+
+MAGIC = b"EWT2"
+HEADER_LENGTH = struct.Struct("<I")
+INDEX_DIR = os.path.join(CACHE_DIR, "substringIndex")
+
+
+def foldEightToOO(word):
+    return cleanDiacritics(word).replace("8", "oo")
+
+
+foldFunctions = {
+    "exact": lambda word: word,
+    "noDiacritics": cleanDiacritics,
+    "8oo": foldEightToOO
+}
+
+
+def getTrigrams(word):
+    trigrams = set()
+    for i in range(len(word) - 2):
+        trigrams.add(word[i:i + 3])
+    return trigrams
+
+
+class SubstringIndex:
+    def __init__(self, vocab, fold, forms, trigrams, trigramStarts, wordIDs):
+        self.vocab = vocab
+        self.fold = fold
+        self.foldWord = foldFunctions[fold]
+        self.forms = forms
+        self.trigramToIndex = {trigram: i for i, trigram in enumerate(trigrams)}
+        self.trigramStarts = trigramStarts
+        self.wordIDs = wordIDs
+
+    def getTrigramWordIDs(self, trigram):
+        trigramIndex = self.trigramToIndex.get(trigram)
+        if trigramIndex is None:
+            return []
+        return self.wordIDs[self.trigramStarts[trigramIndex]:self.trigramStarts[trigramIndex + 1]]
+
+    def find(self, query):
+        """Every vocabulary word whose folded form contains the folded query,
+        in vocabulary (sorted) order."""
+        query = self.foldWord(query)
+        forms = self.forms
+        if len(query) < 3:
+            return [self.vocab[i] for i in range(len(forms)) if query in forms[i]]
+
+        # Smallest posting list first; each later one only narrows it down.
+        trigramLists = sorted((self.getTrigramWordIDs(trigram) for trigram in getTrigrams(query)), key=len)
+        candidates = set(trigramLists[0])
+        for wordIDs in trigramLists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates.intersection_update(wordIDs)
+
+        return [self.vocab[i] for i in sorted(candidates) if query in forms[i]]
+
+
+def getVocabHash(vocab):
+    return hashlib.sha1("\0".join(vocab).encode("utf-8")).hexdigest()
+
+
+def getFoldFingerprint(fold):
+    # The fold's bytecode and cleanDiacritics', which the other folds are built
+    # on, the same way corpus.loadFile keys its cache on the tokenizer.
+    # cleanDiacritics is lru_cached, so look through to the function itself.
+    fingerprint = ""
+    for function in [foldFunctions[fold], cleanDiacritics]:
+        fingerprint += getTokenizerFingerprint(getattr(function, "__wrapped__", function))
+    return fingerprint
+
+
+def buildSubstringIndex(vocab, fold):
+    forms = [foldFunctions[fold](word) for word in vocab]
+    trigramLists = {}
+    for wordID in range(len(forms)):
+        for trigram in getTrigrams(forms[wordID]):
+            if trigram not in trigramLists:
+                trigramLists[trigram] = array("I")
+            trigramLists[trigram].append(wordID)
+
+    trigrams = sorted(trigramLists)
+    trigramStarts = array("I", [0])
+    wordIDs = array("I")
+    for trigram in trigrams:
+        wordIDs.extend(trigramLists[trigram])
+        trigramStarts.append(len(wordIDs))
+    return forms, trigrams, trigramStarts, wordIDs
+
+
+def loadSubstringIndex(vocab, fold="exact", name="massIndex"):
+    """The SubstringIndex for vocab (a sorted word list, e.g. MassIndex.vocab)
+    under one fold, from the cache if it was built for this exact vocab and
+    fold."""
+    vocabHash = getVocabHash(vocab)
+    foldFingerprint = getFoldFingerprint(fold)
+    path = os.path.join(INDEX_DIR, f"{name}.{fold}.bin")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] == MAGIC:
+            headerLength = HEADER_LENGTH.unpack_from(data, 4)[0]
+            offset = 4 + HEADER_LENGTH.size
+            header = json.loads(data[offset:offset + headerLength].decode("utf-8"))
+            offset += headerLength
+            if header["vocabHash"] == vocabHash and header.get("fold") == foldFingerprint:
+                trigramStarts = array("I")
+                trigramStarts.frombytes(data[offset:offset + 4 * (len(header["trigrams"]) + 1)])
+                wordIDs = array("I")
+                wordIDs.frombytes(data[offset + 4 * (len(header["trigrams"]) + 1):])
+                return SubstringIndex(vocab, fold, header["forms"], header["trigrams"], trigramStarts, wordIDs)
+
+    forms, trigrams, trigramStarts, wordIDs = buildSubstringIndex(vocab, fold)
+    header = json.dumps({
+        "vocabHash": vocabHash,
+        "fold": foldFingerprint,
+        "forms": forms,
+        "trigrams": trigrams
+    }, ensure_ascii=False).encode("utf-8")
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(trigramStarts.tobytes())
+        f.write(wordIDs.tobytes())
+    os.replace(tempPath, path)
+    return SubstringIndex(vocab, fold, forms, trigrams, trigramStarts, wordIDs)
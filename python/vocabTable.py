@@ -0,0 +1,347 @@
+"""Every word of ../texts in one table, with a bitset per word of where it occurs.
+
+authorhapax, metricalHapax and kjvConc each answer "which texts (or editions)
+contain this word?" by building dicts of dicts and checking them one word at a
+time. This gives every distinct word an integer ID (its place in the sorted
+vocabulary) and keeps, as NumPy uint64 arrays:
+
+    textBits        (words x ceil(texts / 64)): bit t set if text t has the word
+    editionBits     (words,): bit e set if any text of edition e has it
+
+so "words only in these texts", "words in none of those" and "words in
+exactly one of them" are a few bitwise operations over the whole vocabulary.
+
+A text is a file in ../texts, or a (file, tag) selection of its lines as in
+authorhapax's authors table: lines whose address ends in tag ("a" for every
+line), skipping those marked ×. Words are library.cleanWord headwords (the
+corpus "cleanWord" variant) unless another variant and tokenizer are passed,
+as metricalHapax does; folded() is the same table over their
+cleanDiacritics forms with 8 spelled oo (substringIndex's "8oo" fold). The
+edition is the middle part of the file name ("Genesis.First Edition.txt" ->
+"First Edition"), or the name itself for single texts like "Milk for
+Babes.txt".
+
+Each text's word lists are cached under corpusCache/textWords/<variant>/, keyed
+by the file's contents, the selection and the tokenizer's code, so only a new
+or edited text is tokenized. The table built from them is saved under
+corpusCache/vocabTable/ (one file per list of texts: b"EWV1", a uint32 header
+length, a JSON header with each text's key, then per table the \0-joined
+vocabulary and textBits) and reused until one of its texts changes. As in
+corpus.loadFile, writing a new entry deletes the older ones it replaces.
+
+    table = loadVocabTable()
+    eliot = table.editionMask(["First Edition", "Second Edition", "Zeroth Edition"])
+    table.words(table.contains(table.textMask([("John.Mayhew.txt", None)])) & ~table.contains(eliot))
+
+Run it for a summary of the table and the words unique to each edition.
+"""
+import bisect
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from corpus import CACHE_DIR, loadFile, getCleanWordTokens, getTokenizerFingerprint
+from substringIndex import foldEightToOO
+
+TEXT_DIR = "../texts"
+WORDS_DIR = os.path.join(CACHE_DIR, "textWords")
+TABLE_DIR = os.path.join(CACHE_DIR, "vocabTable")
+
+MAGIC = b"EWV1"
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def getTextKey(fileName, tag=None, tokenizeLine=getCleanWordTokens):
+    """Changes whenever the text's words could: its contents, the selection,
+    or the tokenizer and fold code."""
+    with open(os.path.join(TEXT_DIR, fileName), "rb") as f:
+        data = f.read()
+    key = hashlib.sha1()
+    key.update(data)
+    key.update(repr(tag).encode("utf-8"))
+    key.update(getTokenizerFingerprint(tokenizeLine).encode("utf-8"))
+    key.update(getTokenizerFingerprint(foldEightToOO).encode("utf-8"))
+    return key.hexdigest()[:16]
+
+
+def pruneOldEntries(directory, prefix, keepName):
+    """Delete the cache files in directory that start with prefix (followed
+    by one more dotted key) other than keepName: older versions of it."""
+    for oldName in os.listdir(directory):
+        if oldName != keepName and oldName.startswith(prefix) and oldName[len(prefix):].count(".") == 1:
+            try:
+                os.remove(os.path.join(directory, oldName))
+            except OSError:
+                pass  # in use by another process (Windows); next time
+
+
+def getTagName(tag):
+    # Tags are single letters like "M" and "μ"; spell them as code points so
+    # they survive case-insensitive and non-Unicode file systems.
+    if tag is None:
+        return "whole"
+    return "-".join(str(ord(char)) for char in tag)
+
+
+def getTextWords(fileName, tag=None, key=None, variant="cleanWord", tokenizeLine=getCleanWordTokens):
+    """The sorted distinct headwords of one text (see the module docstring for
+    tag), and the sorted distinct folded forms of them."""
+    if key is None:
+        key = getTextKey(fileName, tag, tokenizeLine)
+    variantDir = os.path.join(WORDS_DIR, variant)
+    prefix = f"{fileName}.{getTagName(tag)}."
+    cacheName = f"{prefix}{key}.json"
+    path = os.path.join(variantDir, cacheName)
+
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+        return cached["words"], cached["folded"]
+
+    words = set()
+    textCorpus = loadFile(fileName, variant, tokenizeLine, TEXT_DIR)
+    for i in range(len(textCorpus)):
+        line = textCorpus.lines[i]
+        if line.strip() == "":
+            continue
+        if tag is not None:
+            if line.endswith("×"):
+                continue
+            address = line.split(" ")[0].strip()
+            if tag != "a" and address[-1] != tag:
+                continue
+        words.update(textCorpus.tokens(i))
+    folded = sorted(set(foldEightToOO(word) for word in words))
+    words = sorted(words)
+
+    os.makedirs(variantDir, exist_ok=True)
+    tempPath = path + ".tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump({"words": words, "folded": folded}, f, ensure_ascii=False)
+    os.replace(tempPath, path)
+    pruneOldEntries(variantDir, prefix, cacheName)
+    return words, folded
+
+
+def getEdition(fileName):
+    parts = fileName.split(".")
+    return parts[-2] if len(parts) > 2 else parts[0]
+
+
+def buildTextBits(textWords):
+    """The sorted vocabulary of [word list per text], and its textBits."""
+    vocab = sorted(set().union(*textWords))
+    wordToID = {word: i for i, word in enumerate(vocab)}
+    textBits = np.zeros((len(vocab), (len(textWords) + 63) // 64), dtype=np.uint64)
+    for t in range(len(textWords)):
+        wordIDs = np.fromiter((wordToID[word] for word in textWords[t]), dtype=np.int64, count=len(textWords[t]))
+        textBits[wordIDs, t >> 6] |= np.uint64(1 << (t & 63))
+    return vocab, textBits
+
+
+class VocabTable:
+    def __init__(self, texts, vocab, textBits, foldedTable=None):
+        self.texts = texts
+        self.textIndex = {text: i for i, text in enumerate(texts)}
+        self.vocab = vocab
+        self.textBits = textBits
+        self.foldedTable = foldedTable
+
+        self.editions = []
+        editionIndex = {}
+        for fileName, tag in texts:
+            edition = getEdition(fileName)
+            if edition not in editionIndex:
+                editionIndex[edition] = len(self.editions)
+                self.editions.append(edition)
+        if len(self.editions) > 64:
+            raise ValueError(f"{len(self.editions)} editions don't fit editionBits' 64 bits")
+        self.editionTexts = [self.textMask([]) for edition in self.editions]
+        for t in range(len(texts)):
+            e = editionIndex[getEdition(texts[t][0])]
+            self.editionTexts[e][t >> 6] |= np.uint64(1 << (t & 63))
+
+        self.editionBits = np.zeros(len(vocab), dtype=np.uint64)
+        for e in range(len(self.editions)):
+            self.editionBits[self.contains(self.editionTexts[e])] |= np.uint64(1 << e)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def wordID(self, word):
+        """The word's ID (vocab is sorted), or None if no text has it."""
+        i = bisect.bisect_left(self.vocab, word)
+        if i < len(self.vocab) and self.vocab[i] == word:
+            return i
+        return None
+
+    def textMask(self, texts):
+        """Bitmask over the table's texts, each a (fileName, tag) pair."""
+        mask = np.zeros(self.textBits.shape[1], dtype=np.uint64)
+        for text in texts:
+            t = self.textIndex[text]
+            mask[t >> 6] |= np.uint64(1 << (t & 63))
+        return mask
+
+    def editionMask(self, editions):
+        """Bitmask over every text of the given editions."""
+        mask = self.textMask([])
+        for edition in editions:
+            mask |= self.editionTexts[self.editions.index(edition)]
+        return mask
+
+    def contains(self, mask):
+        """Per word: does any text in mask have it?"""
+        return (self.textBits & mask).any(axis=1)
+
+    def textCount(self, mask):
+        """Per word: how many of the texts in mask have it."""
+        bytesPerWord = (self.textBits & mask).astype("<u8").view(np.uint8)
+        return np.unpackbits(bytesPerWord, axis=1).sum(axis=1)
+
+    def words(self, selected):
+        """The words where the boolean array selected is True, in sorted order."""
+        vocab = self.vocab
+        return [vocab[i] for i in np.flatnonzero(selected)]
+
+    def uniqueWords(self, groupMasks, excludedMask=None):
+        """{group: sorted words found in that group's texts and no other
+        group's, nor in any text of excludedMask}."""
+        inGroup = {group: self.contains(mask) for group, mask in groupMasks.items()}
+        groupCount = np.zeros(len(self), dtype=np.int32)
+        for selected in inGroup.values():
+            groupCount += selected
+        allowed = groupCount == 1
+        if excludedMask is not None:
+            allowed &= ~self.contains(excludedMask)
+        return {group: self.words(selected & allowed) for group, selected in inGroup.items()}
+
+    def hapaxes(self, mask):
+        """{text: sorted words found in that text and no other text of mask}."""
+        selected = self.textBits & mask
+        candidates = np.flatnonzero(selected.any(axis=1))
+        bits = np.unpackbits(selected[candidates].astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        single = bits.sum(axis=1) == 1
+        wordIDs = candidates[single]
+        textIDs = bits[single].argmax(axis=1)
+
+        output = {}
+        for wordID, t in zip(wordIDs, textIDs):
+            output.setdefault(self.texts[t], []).append(self.vocab[wordID])
+        return output
+
+    def firstTexts(self, wordIDs):
+        """Per word ID, the index of the first text (in table order) that has
+        the word."""
+        bits = np.unpackbits(self.textBits[wordIDs].astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        return bits.argmax(axis=1)
+
+    def folded(self):
+        """The same table over the folded forms: a folded word is in every
+        text any of its headwords is in."""
+        return self.foldedTable
+
+
+def getAllTexts():
+    return [(fileName, None) for fileName in sorted(os.listdir(TEXT_DIR)) if fileName.endswith(".txt")]
+
+
+def readTable(path, textKeys):
+    """(vocab, textBits, folded vocab, folded textBits) saved for exactly these
+    text keys, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        return None
+    headerLength = HEADER_LENGTH.unpack_from(data, 4)[0]
+    offset = 4 + HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + headerLength].decode("utf-8"))
+    offset += headerLength
+    if header["textKeys"] != textKeys:
+        return None
+
+    arrays = []
+    for vocabBytes, wordCount in header["vocabs"]:
+        vocab = str(data[offset:offset + vocabBytes], "utf-8").split("\0") if wordCount > 0 else []
+        offset += vocabBytes
+        bitsBytes = 8 * wordCount * header["blocks"]
+        textBits = np.frombuffer(data, dtype="<u8", count=wordCount * header["blocks"], offset=offset)
+        offset += bitsBytes
+        arrays += [vocab, textBits.astype(np.uint64).reshape(wordCount, header["blocks"])]
+    return arrays
+
+
+def writeTable(path, textKeys, tables):
+    """tables: [(vocab, textBits)], headwords then folded."""
+    blobs = [("\0".join(vocab).encode("utf-8"), textBits) for vocab, textBits in tables]
+    header = json.dumps({
+        "textKeys": textKeys,
+        "blocks": tables[0][1].shape[1],
+        "vocabs": [[len(blob), len(vocab)] for (blob, textBits), (vocab, _) in zip(blobs, tables)]
+    }).encode("utf-8")
+    os.makedirs(TABLE_DIR, exist_ok=True)
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob, textBits in blobs:
+            f.write(blob)
+            f.write(textBits.astype("<u8").tobytes())
+    os.replace(tempPath, path)
+
+
+def loadVocabTable(extraTexts=(), texts=None, variant="cleanWord", tokenizeLine=getCleanWordTokens):
+    """The table over texts (default: every file in ../texts), plus any
+    (fileName, tag) selections in extraTexts: from the saved copy for this
+    list of texts if none of them has changed, else built and saved."""
+    # The same call always writes under the same prefix, so the table it saved
+    # before ../texts gained or lost a file can be deleted.
+    requestHash = hashlib.sha1(json.dumps([variant, texts, list(extraTexts)], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+    if texts is None:
+        texts = getAllTexts()
+    texts = list(dict.fromkeys(list(texts) + list(extraTexts)))
+    textKeys = [getTextKey(fileName, tag, tokenizeLine) for fileName, tag in texts]
+    textsHash = hashlib.sha1(json.dumps([variant, texts], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+    prefix = f"{requestHash}."
+    cacheName = f"{prefix}{textsHash}.bin"
+    path = os.path.join(TABLE_DIR, cacheName)
+
+    saved = readTable(path, textKeys)
+    if saved is None:
+        textWords = []
+        textFolded = []
+        for (fileName, tag), key in zip(texts, textKeys):
+            words, folded = getTextWords(fileName, tag, key, variant, tokenizeLine)
+            textWords.append(words)
+            textFolded.append(folded)
+        tables = [buildTextBits(textWords), buildTextBits(textFolded)]
+        writeTable(path, textKeys, tables)
+        pruneOldEntries(TABLE_DIR, prefix, cacheName)
+        saved = [tables[0][0], tables[0][1], tables[1][0], tables[1][1]]
+
+    vocab, textBits, foldedVocab, foldedBits = saved
+    return VocabTable(texts, vocab, textBits, VocabTable(texts, foldedVocab, foldedBits))
+
+
+def main():
+    startTime = time.perf_counter()
+    table = loadVocabTable()
+    folded = table.folded()
+    print(f"{len(table)} words ({len(folded)} folded) in {len(table.texts)} texts, "
+          f"{len(table.editions)} editions: loaded in {round(time.perf_counter() - startTime, 2)} seconds")
+
+    editionCounts = np.unpackbits(table.editionBits.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+    for e in range(len(table.editions)):
+        inEdition = (table.editionBits & np.uint64(1 << e)) != 0
+        print(f"{table.editions[e]}: {inEdition.sum()} words, {(inEdition & (editionCounts == 1)).sum()} in no other edition")
+
+
+if __name__ == "__main__":
+    main()